@@ -1,412 +1,147 @@
 import streamlit as st
-import json
-import uuid
-import zipfile
-import io
+import hashlib
 import logging
 from pathlib import Path
 
+from h5p_converter import (
+    collect_diagnostics, compress_questions, export_package, filter_questions, issues_by_position,
+    load_question_bank, merge_diagnostics, notify, package_cache_key, package_source_key, page_count, prepare_package_layout, preview_page,
+    start_build, validate_json_text, PREVIEW_STATUSES, QUESTION_MODELS
+)
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 
-# Function to generate a unique UUID
-def generate_uuid():
-    return str(uuid.uuid4())
-
-# Function to map MultipleChoice questions to H5P format
-def map_multiple_choice(question):
-    try:
-        h5p_question = {
-            "library": "H5P.MultiChoice 1.16",
-            "params": {
-                "question": question.get("question", "Keine Frage gestellt."),
-                "answers": [],
-                "behaviour": {
-                    "singleAnswer": True,
-                    "enableRetry": False,
-                    "enableSolutionsButton": False,
-                    "enableCheckButton": True,
-                    "type": "auto",
-                    "singlePoint": False,
-                    "randomAnswers": True,  # This will be controlled globally
-                    "showSolutionsRequiresInput": True,
-                    "confirmCheckDialog": False,
-                    "confirmRetryDialog": False,
-                    "autoCheck": False,
-                    "passPercentage": 100,
-                    "showScorePoints": True
-                },
-                "media": {
-                    "disableImageZooming": False
-                },
-                "overallFeedback": [
-                    {
-                        "from": 0,
-                        "to": 100
-                    }
-                ],
-                "UI": {
-                    "checkAnswerButton": "Überprüfen",
-                    "submitAnswerButton": "Absenden",
-                    "showSolutionButton": "Lösung anzeigen",
-                    "tryAgainButton": "Wiederholen",
-                    "tipsLabel": "Hinweis anzeigen",
-                    "scoreBarLabel": "Du hast :num von :total Punkten erreicht.",
-                    "tipAvailable": "Hinweis verfügbar",
-                    "feedbackAvailable": "Rückmeldung verfügbar",
-                    "readFeedback": "Rückmeldung vorlesen",
-                    "wrongAnswer": "Falsche Antwort",
-                    "correctAnswer": "Richtige Antwort",
-                    "shouldCheck": "Hätte gewählt werden müssen",
-                    "shouldNotCheck": "Hätte nicht gewählt werden sollen",
-                    "noInput": "Bitte antworte, bevor du die Lösung ansiehst",
-                    "a11yCheck": "Die Antworten überprüfen. Die Auswahlen werden als richtig, falsch oder fehlend markiert.",
-                    "a11yShowSolution": "Die Lösung anzeigen. Die richtigen Lösungen werden in der Aufgabe angezeigt.",
-                    "a11yRetry": "Die Aufgabe wiederholen. Alle Versuche werden zurückgesetzt und die Aufgabe wird erneut gestartet."
-                },
-                "confirmCheck": {
-                    "header": "Beenden?",
-                    "body": "Ganz sicher beenden?",
-                    "cancelLabel": "Abbrechen",
-                    "confirmLabel": "Beenden"
-                },
-                "confirmRetry": {
-                    "header": "Wiederholen?",
-                    "body": "Ganz sicher wiederholen?",
-                    "cancelLabel": "Abbrechen",
-                    "confirmLabel": "Bestätigen"
-                }
-            },
-            "subContentId": generate_uuid(),
-            "metadata": {
-                "contentType": "Multiple Choice",
-                "license": "U",
-                "title": "Multiple Choice",
-                "authors": [],
-                "changes": [],
-                "extraTitle": "Multiple Choice"
-            }
-        }
-
-        options = question.get("options", [])
-        if not isinstance(options, list):
-            st.warning(f"'options' is not a list in MultipleChoice question: {question.get('question', 'Keine Frage')}")
-            return h5p_question
-
-        for option in options:
-            answer = {
-                "text": option.get("text", ""),
-                "correct": option.get("is_correct", False),
-                "tipsAndFeedback": {
-                    "tip": "",
-                    "chosenFeedback": f"<div>{option.get('feedback', '')}</div>\n",
-                    "notChosenFeedback": ""
-                }
-            }
-            h5p_question["params"]["answers"].append(answer)
-
-        return h5p_question
-
-    except Exception as e:
-        st.error(f"Error mapping MultipleChoice question: {e}")
-        return {}
-
-# Function to map TrueFalse questions to H5P format
-def map_true_false(question):
+# Function to memoize a value across Streamlit reruns, keeping only the latest key per slot
+def session_memo(slot, key, compute):
+    memo = st.session_state.get(slot)
+    if memo is not None and memo[0] == key:
+        return memo[1]
+    value = compute()
+    # Failed steps are not stored, so their messages show again on the next attempt
+    if value is not None:
+        st.session_state[slot] = (key, value)
+    return value
+
+# Function to show the messages and timing breakdown of a build in the UI
+def show_diagnostics(diagnostics):
+    for level, text in diagnostics.messages:
+        getattr(st, level)(text)
+    total = sum(diagnostics.spans.values())
+    with st.expander(f"Build timing ({total * 1000:.1f} ms)", expanded=False):
+        st.table([
+            {"stage": stage, "ms": round(seconds * 1000, 2), "share": f"{seconds / total:.0%}" if total else "-"}
+            for stage, seconds in diagnostics.spans.items()
+        ])
+        if diagnostics.counters:
+            st.table([{"counter": name, "value": value} for name, value in diagnostics.counters.items()])
+
+# Function to parse the pasted text into question models; its messages and timings are
+# kept with the bank and reported by the build that maps the questions
+def parse_question_bank(pasted_json):
+    with collect_diagnostics("Pasted_JSON", record=False) as parse_diagnostics:
+        question_bank = load_question_bank(pasted_json, "Pasted_JSON")
+    return question_bank, parse_diagnostics
+
+# Function to build the package of the pasted questions; runs on the background
+# executor, so it reports through notify and returns what the session keeps
+def build_package(question_bank, source_key, template_zip_path, user_image_bytes, settings, content_only, mapped_questions=None, layout=None, parse_diagnostics=None):
     try:
-        correct_answer = question.get("correct_answer", False)
-        feedback_correct = question.get("feedback_correct", "")
-        feedback_incorrect = question.get("feedback_incorrect", "")
-
-        h5p_question = {
-            "library": "H5P.TrueFalse 1.8",
-            "params": {
-                "question": question.get("question", "Keine Frage gestellt."),
-                "correct": "true" if correct_answer else "false",
-                "behaviour": {
-                    "enableRetry": False,
-                    "enableSolutionsButton": False,
-                    "enableCheckButton": True,
-                    "confirmCheckDialog": False,
-                    "confirmRetryDialog": False,
-                    "autoCheck": False,
-                    "feedbackOnCorrect": feedback_correct,
-                    "feedbackOnWrong": feedback_incorrect
-                },
-                "media": {
-                    "disableImageZooming": False
-                },
-                "l10n": {
-                    "trueText": "Wahr",
-                    "falseText": "Falsch",
-                    "score": "Du hast @score von @total Punkten erreicht.",
-                    "checkAnswer": "Überprüfen",
-                    "submitAnswer": "Absenden",
-                    "showSolutionButton": "Lösung anzeigen",
-                    "tryAgain": "Wiederholen",
-                    "wrongAnswerMessage": "Falsche Antwort",
-                    "correctAnswerMessage": "Richtige Antwort",
-                    "scoreBarLabel": "Du hast :num von :total Punkten erreicht.",
-                    "a11yCheck": "Die Antworten überprüfen. Die Antwort wird als richtig, falsch oder unbeantwortet markiert.",
-                    "a11yShowSolution": "Die Lösung anzeigen. Die richtige Lösung wird in der Aufgabe angezeigt.",
-                    "a11yRetry": "Die Aufgabe wiederholen. Alle Versuche werden zurückgesetzt, und die Aufgabe wird erneut gestartet."
-                },
-                "confirmCheck": {
-                    "header": "Beenden?",
-                    "body": "Ganz sicher beenden?",
-                    "cancelLabel": "Abbrechen",
-                    "confirmLabel": "Beenden"
-                },
-                "confirmRetry": {
-                    "header": "Wiederholen?",
-                    "body": "Ganz sicher wiederholen?",
-                    "cancelLabel": "Abbrechen",
-                    "confirmLabel": "Bestätigen"
-                }
-            },
-            "subContentId": generate_uuid(),
-            "metadata": {
-                "contentType": "True/False Question",
-                "license": "U",
-                "title": "Richtig Falsch",
-                "authors": [],
-                "changes": [],
-                "extraTitle": "Richtig Falsch"
-            }
-        }
-
-        return h5p_question
-
-    except Exception as e:
-        st.error(f"Error mapping TrueFalse question: {e}")
-        return {}
-
-# Function to map questions to H5P format
-def map_questions_to_h5p(llm_questions, source_name):
-    h5p_questions = []
-    for idx, question in enumerate(llm_questions, start=1):
-        q_type = question.get("type", "").strip()
-        if q_type == "MultipleChoice":
-            h5p_q = map_multiple_choice(question)
-        elif q_type == "TrueFalse":
-            h5p_q = map_true_false(question)
+        if layout is not None:
+            notify("info", f"Only the settings changed, reusing {layout.question_count} mapped questions.")
         else:
-            st.warning(f"Unsupported question type '{q_type}' in '{source_name}'. Skipping question #{idx}.")
-            continue  # Skip unsupported question types
-        if h5p_q:  # Only append if mapping was successful
-            h5p_questions.append(h5p_q)
-    st.info(f"Mapped {len(h5p_questions)} questions from '{source_name}'.")
-    return h5p_questions
-
-# Function to create H5P content structure with customization
-def create_h5p_content(questions, title, randomization, pool_size, pass_percentage):
-    h5p_content = {
-        "introPage": {
-            "showIntroPage": True,
-            "startButtonText": "Quiz starten",
-            "title": title,
-            "introduction": (
-                "<p style=\"text-align:center\"><strong>Starten Sie das Quiz, um Ihr Wissen zu testen.</strong></p>"
-                "<p style=\"text-align:center\"> </p>"
-                f"<p style=\"text-align:center\"> <strong>Pro Runde werden zufällig {pool_size} Fragen angezeigt.</strong></p>"
-                "<p style=\"text-align:center\"><strong>Wiederholen Sie die Übung, um weitere Fragen zu beantworten.</strong></p>"
-            ),
-            "backgroundImage": {
-                "path": "images/file-_jmSDW4b9EawjImv.png",
-                "mime": "image/png",
-                "copyright": {
-                    "license": "U"
-                },
-                "width": 52,
-                "height": 52
-            }
-        },
-        "progressType": "textual",
-        "passPercentage": pass_percentage,
-        "disableBackwardsNavigation": True,
-        "randomQuestions": randomization,
-        "endGame": {
-            "showResultPage": True,
-            "showSolutionButton": True,
-            "showRetryButton": True,
-            "noResultMessage": "Quiz beendet",
-            "message": "Dein Ergebnis:",
-            "scoreBarLabel": "Du hast @score von @total Punkten erreicht.",
-            "overallFeedback": [
-                {
-                    "from": 0,
-                    "to": 50,
-                    "feedback": "Kein Grund zur Sorge! Tipp: Schau dir die Lösungen an, bevor du in die nächste Runde startest."
-                },
-                {
-                    "from": 51,
-                    "to": 75,
-                    "feedback": "Du weisst schon einiges über das Thema. Mit jeder Wiederholung kannst du dich steigern."
-                },
-                {
-                    "from": 76,
-                    "to": 100,
-                    "feedback": "Gut gemacht!"
-                }
-            ],
-            "solutionButtonText": "Lösung anzeigen",
-            "retryButtonText": "Nächste Runde",
-            "finishButtonText": "Beenden",
-            "submitButtonText": "Absenden",
-            "showAnimations": False,
-            "skippable": False,
-            "skipButtonText": "Video überspringen"
-        },
-        "override": {
-            "checkButton": True
-        },
-        "texts": {
-            "prevButton": "Zurück",
-            "nextButton": "Weiter",
-            "finishButton": "Beenden",
-            "submitButton": "Absenden",
-            "textualProgress": "Frage @current von @total",
-            "jumpToQuestion": "Frage %d von %total",
-            "questionLabel": "Frage",
-            "readSpeakerProgress": "Frage @current von @total",
-            "unansweredText": "Unbeantwortet",
-            "answeredText": "Beantwortet",
-            "currentQuestionText": "Aktuelle Frage",
-            "navigationLabel": "Fragen"
-        },
-        "poolSize": pool_size,
-        "questions": questions
-    }
-    return h5p_content
-
-# Function to clean JSON content by replacing 'ß' with 'ss'
-def clean_json_content(content_str):
-    try:
-        cleaned_content = content_str.replace('ß', 'ss')
-        # Validate JSON
-        json.loads(cleaned_content)
-        return cleaned_content
-    except json.JSONDecodeError as e:
-        st.error(f"JSON decoding error after cleaning: {e}")
-        return None
-    except Exception as e:
-        st.error(f"Unexpected error during JSON cleaning: {e}")
-        return None
-
-# Function to create H5P package in memory
-def create_h5p_package(content_json_str, template_zip_path, title, user_image_bytes=None):
-    try:
-        # Load the template zip file
-        with open(template_zip_path, 'rb') as f:
-            template_bytes = f.read()
-
-        with zipfile.ZipFile(io.BytesIO(template_bytes), 'r') as template_zip:
-            # Create a new in-memory zip file
-            in_memory_zip = io.BytesIO()
-            with zipfile.ZipFile(in_memory_zip, 'w', zipfile.ZIP_DEFLATED) as new_zip:
-                # Copy all contents from the template zip to the new zip
-                for item in template_zip.infolist():
-                    file_data = template_zip.read(item.filename)
-                    new_zip.writestr(item, file_data)
-
-                # Add the cleaned content.json to the 'content/' folder
-                new_zip.writestr('content/content.json', content_json_str.encode('utf-8'))
-
-                # **Begin Image Replacement**
-                if user_image_bytes:
-                    # Define the path to the image in the H5P package
-                    image_path = 'content/images/file-_jmSDW4b9EawjImv.png'
-                    new_zip.writestr(image_path, user_image_bytes)
-                    st.info("Uploaded image has been successfully integrated into the H5P package.")
-                # **End Image Replacement**
-
-                # Create h5p.json with dynamic titles
-                h5p_content = {
-                    "embedTypes": ["iframe"],
-                    "language": "en",
-                    "license": "U",
-                    "extraTitle": title,  # Dynamic title
-                    "title": title,        # Dynamic title
-                    "mainLibrary": "H5P.QuestionSet",
-                    "preloadedDependencies": [
-                        {"machineName": "H5P.MultiChoice", "majorVersion": 1, "minorVersion": 16},
-                        {"machineName": "FontAwesome", "majorVersion": 4, "minorVersion": 5},
-                        {"machineName": "H5P.JoubelUI", "majorVersion": 1, "minorVersion": 3},
-                        {"machineName": "H5P.Transition", "majorVersion": 1, "minorVersion": 0},
-                        {"machineName": "H5P.FontIcons", "majorVersion": 1, "minorVersion": 0},
-                        {"machineName": "H5P.Question", "majorVersion": 1, "minorVersion": 5},
-                        {"machineName": "H5P.TrueFalse", "majorVersion": 1, "minorVersion": 8},
-                        {"machineName": "H5P.Video", "majorVersion": 1, "minorVersion": 6},
-                        {"machineName": "H5P.QuestionSet", "majorVersion": 1, "minorVersion": 20}
-                    ],
-                    "defaultLanguage": "de"
-                }
-
-                h5p_json_str = json.dumps(h5p_content, indent=4)
-                # Add h5p.json to the root of the zip
-                new_zip.writestr('h5p.json', h5p_json_str.encode('utf-8'))
-
-        in_memory_zip.seek(0)
-        return in_memory_zip.getvalue()
-
-    except FileNotFoundError:
-        st.error(f"Template zip file not found at '{template_zip_path}'. Please ensure the path is correct.")
-        return None
+            if mapped_questions is None:
+                # The questions are mapped in this build, so their parsing is reported with it
+                if parse_diagnostics is not None:
+                    merge_diagnostics(parse_diagnostics)
+                mapped_questions = compress_questions(question_bank, "Pasted_JSON")
+            layout = mapped_questions and prepare_package_layout(
+                json_data=None,
+                source_name="Pasted_JSON",
+                template_zip_path=template_zip_path,
+                user_image_bytes=user_image_bytes,  # Pass the uploaded image bytes
+                source_key=source_key,
+                mapped_questions=mapped_questions
+            )
+        h5p_package = layout and export_package(
+            layout=layout,
+            source_name="Pasted_JSON",
+            template_zip_path=template_zip_path,
+            cache_key=package_cache_key(source_key, content_only=content_only, **settings),
+            content_only=content_only,
+            **settings
+        )
     except Exception as e:
-        st.error(f"Error creating H5P package: {e}")
+        notify("error", f"Error processing pasted JSON: {e}")
         return None
+    return h5p_package, mapped_questions, layout
+
+# Function to show a running build; reruns every half second and refreshes the page once the build is done
+@st.fragment(run_every=0.5)
+def show_build_progress(job):
+    if job.done():
+        st.rerun()
+    progress = job.progress()
+    stage = progress.stage or "waiting for a worker"
+    if progress.questions_total:
+        fraction = min(progress.questions_done / progress.questions_total, 1.0)
+        st.progress(fraction, text=f"Building ({stage}): {progress.questions_done}/{progress.questions_total} questions mapped, {progress.seconds:.1f} s")
+    else:
+        st.progress(0.0, text=f"Building ({stage}), {progress.seconds:.1f} s")
+    if st.button("Cancel build"):
+        job.cancel()
+        st.rerun()
+
+# Labels of the validation status filters
+PREVIEW_STATUS_LABELS = {"all": "All questions", "problems": "With problems", "valid": "Without problems"}
+
+# Function to show one previewed question as it will appear in the package
+def show_preview_item(item):
+    params = item.h5p["params"]
+    header = f"**#{item.position} · {item.type}**"
+    if item.issues:
+        header += f" · :orange[{len(item.issues)} problem{'s' if len(item.issues) != 1 else ''}]"
+    with st.container(border=True):
+        st.markdown(header)
+        st.text(params["question"])
+        if item.type == "MultipleChoice":
+            st.text("\n".join(
+                f"{'[x]' if answer['correct'] else '[ ]'} {answer['text']}"
+                for answer in params["answers"]
+            ) or "(no options)")
+        else:
+            st.text(f"Correct answer: {'Wahr' if params['correct'] == 'true' else 'Falsch'}")
+        for issue in item.issues:
+            st.caption(f"{issue.field} {issue.reason}")
+
+# Function to preview the question bank a page at a time; as a fragment, paging and
+# filtering rerun only the preview, and only the questions of the page are mapped
+@st.fragment
+def show_question_preview(question_bank, validation_report, text_key):
+    issues = issues_by_position(validation_report)
+    search_column, type_column, status_column = st.columns([2, 2, 1])
+    query = search_column.text_input("Search", key="preview_query")
+    types = type_column.multiselect("Question types", list(QUESTION_MODELS), key="preview_types")
+    status = status_column.selectbox("Status", PREVIEW_STATUSES, format_func=PREVIEW_STATUS_LABELS.get, key="preview_status")
+
+    # The filtered indices are memoized, so paging does not scan the bank again
+    matches = session_memo(
+        "preview_matches", (text_key, query, tuple(types), status),
+        lambda: filter_questions(question_bank, query, types, status, issues)
+    )
+    if not matches:
+        st.info("No questions match the filters.")
+        return
 
-# Function to process each JSON input (from file or text)
-def process_json_input(json_data, source_name, template_zip_path, title, randomization, pool_size, pass_percentage, user_image_bytes=None):
-    try:
-        if not isinstance(json_data, dict):
-            st.error(f"Expected a JSON object, but got {type(json_data).__name__}.")
-            return None
-
-        questions = json_data.get("questions", [])
-        if not isinstance(questions, list):
-            st.error(f"Expected 'questions' to be a list in '{source_name}', but got {type(questions).__name__}.")
-            return None
-
-        if not questions:
-            st.warning(f"No questions found in '{source_name}'.")
-            return None
-
-        # Map questions to H5P format
-        h5p_questions = map_questions_to_h5p(questions, source_name)
-        if not h5p_questions:
-            st.warning(f"No valid questions mapped from '{source_name}'.")
-            return None
-
-        # Create H5P content structure with customization
-        h5p_content = create_h5p_content(h5p_questions, title, randomization, pool_size, pass_percentage)
-
-        # Serialize to JSON string
-        h5p_content_str = json.dumps(h5p_content, ensure_ascii=False, indent=4)
-
-        # Clean the JSON content by replacing 'ß' with 'ss'
-        cleaned_content = clean_json_content(h5p_content_str)
-        if not cleaned_content:
-            st.error(f"Cleaning JSON content failed for '{source_name}'.")
-            return None
-
-        # Generate a title based on the source name if not provided
-        base_name = Path(title).stem if isinstance(title, str) else "H5P_Content"
-
-        # Create H5P package with the user-uploaded image
-        h5p_package_bytes = create_h5p_package(cleaned_content, template_zip_path, base_name, user_image_bytes=user_image_bytes)
-        if not h5p_package_bytes:
-            st.error(f"Failed to create H5P package for '{source_name}'.")
-            return None
-
-        return h5p_package_bytes
-
-    except json.JSONDecodeError as e:
-        st.error(f"JSONDecodeError while loading '{source_name}': {e}")
-        return None
-    except Exception as e:
-        st.error(f"Unexpected error while processing '{source_name}': {e}")
-        return None
+    size_column, page_column = st.columns(2)
+    page_size = size_column.selectbox("Questions per page", [10, 25, 50], key="preview_page_size")
+    pages = page_count(len(matches), page_size)
+    # Keyless, so the page resets whenever the number of pages changes
+    page = page_column.number_input(f"Page (1-{pages})", min_value=1, max_value=pages, value=1, step=1)
+    start = (page - 1) * page_size
+    st.caption(f"Showing {start + 1}-{min(start + page_size, len(matches))} of {len(matches)} matching questions")
+    for item in preview_page(question_bank, matches, page, page_size, issues):
+        show_preview_item(item)
 
 # Streamlit App Layout
 def main():
@@ -424,11 +159,15 @@ def main():
             2. **Process JSON:** Click the "Create H5P Package" button to transform the pasted JSON.
             3. **Download H5P File:** After processing, download your `.h5p` package.
 
+            **Preview:** Open the preview to page through the questions as they will be packaged,
+            search them and filter by type or by validation problems before exporting.
+
             **Customization Options:**
             1. **Title of the Unit:** Enter a custom title for your H5P content.
             2. **Randomization of Questions:** Toggle to enable or disable random question order.
             3. **Limit Questions:** Select the number of questions to display per session.
             4. **Percentage to Succeed:** Choose the passing score percentage.
+            5. **Content only:** Leave out the H5P libraries if your platform already has them installed.
 
             **Image Upload:**
             1. **Upload Title Image:** Upload an image to be used as the title image for your H5P content.
@@ -454,13 +193,21 @@ def main():
         index=1  # Default to 60%
     )
 
+    # Content only
+    content_only = st.sidebar.checkbox(
+        "Content only (platform already has the H5P libraries)", value=False,
+        help="Leaves the H5P libraries out of the package, for platforms that already have them installed."
+    )
+
     # **Begin Image Upload Feature**
     st.sidebar.header("Upload Title Image")
     uploaded_image = st.sidebar.file_uploader("Choose an image for the title", type=["png", "jpg", "jpeg"])
     user_image_bytes = None
     if uploaded_image:
         try:
-            user_image_bytes = uploaded_image.read()
+            # The upload is only read once; reruns reuse the bytes until a new file is chosen
+            upload_id = (getattr(uploaded_image, "file_id", None), uploaded_image.name, uploaded_image.size)
+            user_image_bytes = session_memo("uploaded_image", upload_id, uploaded_image.getvalue)
             st.sidebar.success("Image uploaded successfully!")
         except Exception as e:
             st.sidebar.error(f"Error reading the uploaded image: {e}")
@@ -481,20 +228,69 @@ def main():
     # Process pasted JSON
     if pasted_json.strip():
         st.subheader("Processing Pasted JSON")
+
+        # Check the whole bank on every change of the pasted text, once per content
+        text_key = hashlib.sha256(pasted_json.encode('utf-8')).hexdigest()
+        validation_report = session_memo("validation_report", text_key, lambda: validate_json_text(pasted_json))
+        if validation_report:
+            st.warning(f"Found {len(validation_report)} problems in the pasted JSON. Invalid questions are skipped or filled with defaults.")
+            st.dataframe([issue._asdict() for issue in validation_report], use_container_width=True)
+        else:
+            st.success("All questions match the expected format.")
+
+        # The pasted text is parsed once per content into compact question models
+        try:
+            question_bank, parse_diagnostics = session_memo("question_bank", text_key, lambda: parse_question_bank(pasted_json))
+        except ValueError as e:
+            st.error(f"Invalid JSON in pasted content: {e}")
+            return
+
+        with st.expander(f"Preview ({len(question_bank)} questions)", expanded=False):
+            show_question_preview(question_bank, validation_report, text_key)
+
+        # Builds run in the background; the job is keyed by everything the package
+        # depends on, so repeated clicks reuse it instead of starting another build
+        settings = {"title": title, "randomization": randomization, "pool_size": pool_size, "pass_percentage": pass_percentage}
+        source_key = package_source_key(text_key.encode('ascii'), template_zip_path, user_image_bytes)
+        build_key = package_cache_key(source_key, content_only=content_only, **settings)
+        job = st.session_state.get("build_job")
+
         if st.button("Create H5P Package"):
-            try:
-                json_data = json.loads(pasted_json)
-                h5p_package = process_json_input(
-                    json_data=json_data,
-                    source_name="Pasted_JSON",
-                    template_zip_path=template_zip_path,
-                    title=title,
-                    randomization=randomization,
-                    pool_size=pool_size,
-                    pass_percentage=pass_percentage,
-                    user_image_bytes=user_image_bytes  # Pass the uploaded image bytes
+            # A running build, or a finished one that produced a package, is kept
+            reusable = job is not None and job.key == build_key and not job.cancelled and (not job.done() or bool(job.result() and job.result()[0]))
+            if reusable:
+                if not job.done():
+                    st.info("This package is already being built.")
+            else:
+                if job is not None and not job.done():
+                    job.cancel()  # Outdated inputs or settings
+                # Reuse the last mapping and layout when only the settings changed
+                mapped_questions = st.session_state.get("mapped_questions")
+                last_layout = st.session_state.get("package_layout")
+                job = start_build(
+                    build_key, "Pasted_JSON", build_package,
+                    question_bank, source_key, template_zip_path, user_image_bytes, settings, content_only,
+                    mapped_questions=mapped_questions[1] if mapped_questions and mapped_questions[0] == text_key else None,
+                    layout=last_layout[1] if last_layout and last_layout[0] == source_key else None,
+                    parse_diagnostics=parse_diagnostics,
+                    questions_total=len(question_bank)
                 )
-                if h5p_package:
+                st.session_state["build_job"] = job
+
+        # Only the build of the current inputs and settings is shown
+        if job is not None and job.key == build_key:
+            if not job.done():
+                show_build_progress(job)
+            else:
+                result = job.result()
+                show_diagnostics(job.diagnostics)
+                if job.started is None:
+                    st.warning("The build was cancelled before it started.")
+                elif result and result[0]:
+                    h5p_package, mapped_questions, layout = result
+                    # Keep the mapping and layout so changing only the settings skips them
+                    st.session_state["mapped_questions"] = (text_key, mapped_questions)
+                    st.session_state["package_layout"] = (source_key, layout)
                     h5p_filename = "pasted_content.h5p"
                     st.download_button(
                         label=f"Download `{h5p_filename}`",
@@ -502,10 +298,6 @@ def main():
                         file_name=h5p_filename,
                         mime="application/zip"
                     )
-            except json.JSONDecodeError as e:
-                st.error(f"JSONDecodeError in pasted content: {e}")
-            except Exception as e:
-                st.error(f"Error processing pasted JSON: {e}")
 
     if not pasted_json.strip():
         st.info("Please upload a JSON file or paste JSON content above to begin.")
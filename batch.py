@@ -0,0 +1,191 @@
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from h5p_converter import collect_diagnostics, init_worker, process_json_stream, worker_options
+
+# Initialize logging
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_TEMPLATE_PATH = Path(__file__).parent / "templates" / "MC_TF.zip"
+
+# Function to collect the question files from directories, files and glob patterns
+def collect_input_files(inputs):
+    files = []
+    for pattern in inputs:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(path.glob("*.json"))
+        else:
+            matches = [Path(match) for match in sorted(glob.glob(pattern, recursive=True))]
+        for match in matches:
+            if match.is_file() and match not in files:
+                files.append(match)
+    return files
+
+# Function to convert a single question file, streaming it to output_file if given
+def convert_file(json_path, output_file=None):
+    json_path = Path(json_path)
+    started = time.perf_counter()
+    options = {
+        "source_name": json_path.name,
+        "template_zip_path": worker_options["template_zip_path"],
+        "title": worker_options["title"] or json_path.stem,
+        "randomization": worker_options["randomization"],
+        "pool_size": worker_options["pool_size"],
+        "pass_percentage": worker_options["pass_percentage"],
+        "user_image_bytes": worker_options["user_image_bytes"],
+        "content_only": worker_options["content_only"]
+    }
+    # Questions are parsed and mapped as the file is read, so large banks
+    # never have to be loaded as a whole
+    with collect_diagnostics(json_path.name) as diagnostics:
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                if output_file is None:
+                    h5p_package = process_json_stream(f, **options)
+                else:
+                    output_file = Path(output_file)
+                    with open(output_file, 'wb') as out:
+                        h5p_package = process_json_stream(f, **options, output_stream=out)
+                    if not h5p_package:
+                        output_file.unlink(missing_ok=True)
+        except OSError as e:
+            return json_path, None, f"Could not read JSON: {e}", time.perf_counter() - started, diagnostics.summary()
+    if not h5p_package:
+        return json_path, None, diagnostics.failure_reason(), time.perf_counter() - started, diagnostics.summary()
+    return json_path, h5p_package, None, time.perf_counter() - started, diagnostics.summary()
+
+# Function to build an argparse type for integers within [minimum, maximum]
+def bounded_int(minimum, maximum=None):
+    def parse(value):
+        try:
+            number = int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid integer: '{value}'")
+        if number < minimum or (maximum is not None and number > maximum):
+            bounds = f"between {minimum} and {maximum}" if maximum is not None else f"at least {minimum}"
+            raise argparse.ArgumentTypeError(f"must be {bounds}, got {number}")
+        return number
+    return parse
+
+# Function to parse the command line arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a batch of LLM question JSON files into H5P packages.")
+    parser.add_argument("inputs", nargs="+", help="Directories, JSON files or glob patterns (e.g. 'units/**/*.json').")
+    parser.add_argument("-o", "--output", required=True, help="Output directory, or a path ending in .zip to bundle all packages into one archive.")
+    parser.add_argument("--title", default=None, help="Title of the unit (default: the input file name).")
+    parser.add_argument("--no-randomize", dest="randomization", action="store_false", help="Disable random question order.")
+    parser.add_argument("--pool-size", type=bounded_int(1), default=7, help="Number of questions to show per round (default: 7).")
+    parser.add_argument("--pass-percentage", type=bounded_int(0, 100), default=60, help="Percentage to succeed (default: 60).")
+    parser.add_argument("--image", default=None, help="Title image (png/jpg) to embed in every package.")
+    parser.add_argument("--content-only", action="store_true", help="Leave out the H5P libraries, for platforms that already have them installed.")
+    parser.add_argument("--template", default=str(DEFAULT_TEMPLATE_PATH), help="Path to the H5P template zip.")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes (default: CPU count).")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    files = collect_input_files(args.inputs)
+    if not files:
+        print("No JSON files found for the given inputs.", file=sys.stderr)
+        return 1
+
+    template_zip_path = Path(args.template)
+    if not template_zip_path.exists():
+        print(f"Template zip file not found at '{template_zip_path}'.", file=sys.stderr)
+        return 1
+
+    user_image_bytes = None
+    if args.image:
+        try:
+            user_image_bytes = Path(args.image).read_bytes()
+        except OSError as e:
+            print(f"Error reading the image: {e}", file=sys.stderr)
+            return 1
+
+    options = {
+        "template_zip_path": template_zip_path,
+        "title": args.title,
+        "randomization": args.randomization,
+        "pool_size": args.pool_size,
+        "pass_percentage": args.pass_percentage,
+        "user_image_bytes": user_image_bytes,
+        "content_only": args.content_only
+    }
+
+    output_path = Path(args.output)
+    bundle = output_path.suffix.lower() == ".zip"
+    if bundle:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        bundle_zip = zipfile.ZipFile(output_path, 'w', zipfile.ZIP_STORED)
+    else:
+        output_path.mkdir(parents=True, exist_ok=True)
+
+    # Files from different directories may share a name
+    jobs = []
+    used_names = set()
+    for json_path in files:
+        h5p_filename = f"{json_path.stem}.h5p"
+        counter = 2
+        while h5p_filename in used_names:
+            h5p_filename = f"{json_path.stem}_{counter}.h5p"
+            counter += 1
+        used_names.add(h5p_filename)
+        jobs.append((json_path, h5p_filename))
+
+    succeeded = 0
+    failed = 0
+    bytes_out = 0
+    stage_seconds = {}
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(options,)) as executor:
+            # Workers stream packages straight to disk; only bundles send bytes back
+            futures = {
+                executor.submit(convert_file, json_path, None if bundle else output_path / h5p_filename): h5p_filename
+                for json_path, h5p_filename in jobs
+            }
+            for future in as_completed(futures):
+                json_path, h5p_package, error, elapsed, summary = future.result()
+                for stage, seconds in summary["spans"].items():
+                    stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+                if error:
+                    failed += 1
+                    print(f"FAIL {json_path}: {error}")
+                    continue
+
+                h5p_filename = futures[future]
+                if bundle:
+                    # Packages are already deflated, storing them avoids a second pass
+                    bundle_zip.writestr(h5p_filename, h5p_package)
+                    package_size = len(h5p_package)
+                else:
+                    package_size = (output_path / h5p_filename).stat().st_size
+                succeeded += 1
+                bytes_out += package_size
+                print(f"OK   {json_path} -> {h5p_filename} ({package_size} bytes, {elapsed:.2f}s)")
+    finally:
+        if bundle:
+            bundle_zip.close()
+
+    total_time = time.perf_counter() - started
+    throughput = succeeded / total_time if total_time > 0 else 0.0
+    print(
+        f"\n{succeeded} succeeded, {failed} failed in {total_time:.2f}s "
+        f"({throughput:.1f} packages/s, {bytes_out / (1024 * 1024):.1f} MiB written to '{output_path}')."
+    )
+    if stage_seconds:
+        # CPU time across all workers, so it can exceed the wall time
+        print("Time per stage: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in stage_seconds.items()))
+    return 0 if failed == 0 else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+import argparse
+import io
+import json
+import platform
+import random
+import struct
+import subprocess
+import sys
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+import h5p_converter as converter
+from h5p_converter import images
+
+DEFAULT_TEMPLATE_PATH = Path(__file__).parent / "templates" / "MC_TF.zip"
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+DEFAULT_BASELINE_PATH = Path(__file__).parent / "benchmark_baseline.json"
+
+# Differences below these are noise, whatever the ratio
+MIN_TIME_DELTA = 0.002  # Seconds
+MIN_MEMORY_DELTA = 256 * 1024  # Bytes
+
+# Function to map questions straight to their serialized H5P JSON fragments
+def map_fragments(llm_questions, source_name):
+    return list(converter.iter_questions_json(llm_questions, source_name))
+
+# Function to build a synthetic question bank with a realistic mix of types and text lengths
+def make_question_bank(size, seed=0):
+    rng = random.Random(seed)
+    words = ["Wärme", "Energie", "Straße", "Prozess", "Zelle", "Säure", "Kraft", "Welle", "Masse", "Strom", "Fluss", "Größe"]
+    sentence = lambda count: " ".join(rng.choice(words) for _ in range(count))
+    questions = []
+    for idx in range(size):
+        if idx % 3 == 2:
+            questions.append({
+                "type": "TrueFalse",
+                "question": f"{sentence(rng.randint(6, 20))}?",
+                "correct_answer": rng.random() < 0.5,
+                "feedback_correct": sentence(8),
+                "feedback_incorrect": sentence(8)
+            })
+        else:
+            correct = rng.randrange(4)
+            questions.append({
+                "type": "MultipleChoice",
+                "question": f"{sentence(rng.randint(6, 20))}?",
+                "options": [
+                    {"text": sentence(rng.randint(1, 6)), "is_correct": option == correct}
+                    for option in range(4)
+                ]
+            })
+    return {"questions": questions}
+
+# Function to build a noisy RGB PNG (incompressible enough to exercise the image path)
+def make_title_image(width=1024, height=768, seed=0):
+    rng = random.Random(seed)
+    rows = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+    chunk = lambda tag, data: struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows, 6))
+        + chunk(b"IEND", b"")
+    )
+
+# Function to time a stage (best of repeats) and measure its peak traced memory in a separate run
+def measure(stage, repeat, setup=None):
+    best = None
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        result = stage()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Tracing slows everything down, so memory is measured on its own run
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {"seconds": best, "peak_bytes": peak}
+
+# Function to measure the memory still held by the result of a build (not its peak)
+def measure_retained(build):
+    tracemalloc.start()
+    try:
+        result = build()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+# Function to run every stage for one bank size and image variant
+def run_case(size, with_image, template_zip_path, repeat):
+    json_data = make_question_bank(size)
+    json_text = json.dumps(json_data, ensure_ascii=False)
+    user_image_bytes = make_title_image() if with_image else None
+    settings = {"title": "Benchmark", "randomization": True, "pool_size": 7, "pass_percentage": 60}
+    stages = {}
+
+    # Ingestion: incremental parsing of the questions array
+    _, stages["parse"] = measure(lambda: sum(1 for _ in converter.iter_json_array_field(json_text)), repeat)
+    question_bank, stages["load_bank"] = measure(lambda: converter.load_question_bank(json_text, "benchmark"), repeat)
+
+    # Memory held by a parsed bank: plain dicts against the slotted question models
+    retained_bytes = {
+        "dicts": measure_retained(lambda: list(converter.iter_json_array_field(json_text))),
+        "models": measure_retained(lambda: converter.load_question_bank(json_text, "benchmark"))
+    }
+
+    # Mapping: per-question H5P dicts (legacy path) and pre-serialized fragments
+    _, stages["map_dicts"] = measure(lambda: converter.map_questions_to_h5p(json_data["questions"], "benchmark"), repeat)
+    fragments, stages["map_fragments"] = measure(lambda: map_fragments(json_data["questions"], "benchmark"), repeat)
+    _, stages["map_models"] = measure(lambda: map_fragments(question_bank, "benchmark"), repeat)
+
+    # Serialization: deflating the questions list and the settings-dependent content.json
+    questions_segment, stages["serialize_questions"] = measure(
+        lambda: converter.compress_segment(converter.questions_json_chunks(fragments)), repeat
+    )
+    mapped_questions = converter.MappedQuestions(questions_segment, len(fragments))
+
+    # Title image: processed once per source image, so the cache is cleared before each run
+    title_image, stages["title_image"] = measure(
+        lambda: converter.prepare_title_image(template_zip_path, user_image_bytes), repeat,
+        setup=images._title_image_cache.clear
+    )
+
+    layout = converter.PackageLayout(None, mapped_questions.segment, mapped_questions.count, title_image, converter.normalize_text)
+    segments, stages["serialize_content"] = measure(lambda: converter.content_segments(layout, **settings), repeat)
+
+    # Packaging: template copy plus generated entries
+    package, stages["package"] = measure(
+        lambda: converter.create_h5p_package(segments, template_zip_path, "Benchmark", title_image=title_image), repeat
+    )
+
+    # End to end, without the finished-package cache
+    _, stages["end_to_end"] = measure(
+        lambda: converter.process_json_stream(json_text, "benchmark", template_zip_path, user_image_bytes=user_image_bytes, output_stream=io.BytesIO(), **settings),
+        repeat, setup=images._title_image_cache.clear
+    )
+
+    return {"questions": size, "image": with_image, "package_bytes": len(package), "retained_bytes": retained_bytes, "stages": stages}
+
+# Function to measure the cold-start time of a fresh interpreter importing a module (best of repeats)
+def measure_import_time(module, repeat):
+    script = (
+        "import time; started = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - started)"
+    )
+    import_seconds = []
+    process_seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent, capture_output=True, text=True, check=True)
+        process_seconds.append(time.perf_counter() - started)
+        import_seconds.append(float(completed.stdout.strip().splitlines()[-1]))
+    return {"import_seconds": min(import_seconds), "process_seconds": min(process_seconds)}
+
+# Function to name a case in reports and baselines
+def case_name(case):
+    return f"{case['questions']}q{'+image' if case['image'] else ''}"
+
+# Function to compare results with a baseline and list the regressions
+def find_regressions(results, baseline, threshold):
+    baseline_cases = {case_name(case): case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        base_case = baseline_cases.get(case_name(case))
+        if base_case is None:
+            continue
+        for stage, metrics in case["stages"].items():
+            base_metrics = base_case["stages"].get(stage)
+            if base_metrics is None:
+                continue
+            for metric, min_delta in (("seconds", MIN_TIME_DELTA), ("peak_bytes", MIN_MEMORY_DELTA)):
+                current, previous = metrics[metric], base_metrics[metric]
+                if current > previous * threshold and current - previous > min_delta:
+                    regressions.append((case_name(case), stage, metric, previous, current))
+        for form, current in case.get("retained_bytes", {}).items():
+            previous = base_case.get("retained_bytes", {}).get(form)
+            if previous is not None and current > previous * threshold and current - previous > MIN_MEMORY_DELTA:
+                regressions.append((case_name(case), "bank_" + form, "retained_bytes", previous, current))
+        if case["package_bytes"] > base_case["package_bytes"] * threshold:
+            regressions.append((case_name(case), "package", "package_bytes", base_case["package_bytes"], case["package_bytes"]))
+    for module, metrics in results.get("imports", {}).items():
+        base_metrics = baseline.get("imports", {}).get(module)
+        if base_metrics is None:
+            continue
+        current, previous = metrics["import_seconds"], base_metrics["import_seconds"]
+        if current > previous * threshold and current - previous > MIN_TIME_DELTA:
+            regressions.append(("import", module, "import_seconds", previous, current))
+    return regressions
+
+# Function to print the results as a table
+def print_results(results):
+    print(f"{'case':<14} {'stage':<20} {'time (ms)':>11} {'peak (KiB)':>12}")
+    for case in results["cases"]:
+        for stage, metrics in case["stages"].items():
+            print(f"{case_name(case):<14} {stage:<20} {metrics['seconds'] * 1000:>11.2f} {metrics['peak_bytes'] / 1024:>12.0f}")
+        print(f"{case_name(case):<14} {'package size':<20} {case['package_bytes']:>11} bytes")
+        retained = case["retained_bytes"]
+        print(f"{case_name(case):<14} {'parsed bank':<20} {retained['dicts'] / 1024:>11.0f} KiB as dicts, {retained['models'] / 1024:.0f} KiB as models")
+    for module, metrics in results.get("imports", {}).items():
+        print(f"{'cold start':<14} {'import ' + module:<20} {metrics['import_seconds'] * 1000:>11.2f} ms ({metrics['process_seconds'] * 1000:.0f} ms with interpreter start)")
+
+# Function to parse the command line arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mapping, serialization and packaging stages of the converter.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Question bank sizes (default: 10 100 1000 10000).")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the best one counts (default: 3).")
+    parser.add_argument("--no-image", dest="images", action="store_const", const=[False], default=[False, True], help="Skip the runs with a title image.")
+    parser.add_argument("--template", default=str(DEFAULT_TEMPLATE_PATH), help="Path to the H5P template zip.")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE_PATH), help="Baseline results to compare with.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Ratio over the baseline counted as a regression (default: 1.25).")
+    parser.add_argument("--import-modules", nargs="*", default=["h5p_converter"], help="Modules whose cold-start import time is measured (default: h5p_converter).")
+    parser.add_argument("--output", default=None, help="Also write the results as JSON to this path.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    template_zip_path = Path(args.template)
+    if not template_zip_path.exists():
+        print(f"Template zip file not found at '{template_zip_path}'.", file=sys.stderr)
+        return 1
+
+    # Load the template up front so no stage pays for the first read
+    converter.load_template(template_zip_path)
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "pillow": images.Image is not None,
+        "cases": [
+            run_case(size, with_image, template_zip_path, args.repeat)
+            for size in args.sizes
+            for with_image in args.images
+        ],
+        "imports": {module: measure_import_time(module, args.repeat) for module in args.import_modules}
+    }
+    print_results(results)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f"\nBaseline saved to '{baseline_path}'.")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"\nNo baseline at '{baseline_path}', run with --save-baseline to create one.")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+    regressions = find_regressions(results, baseline, args.threshold)
+    if not regressions:
+        print(f"\nNo regressions against '{baseline_path}' (threshold {args.threshold:.2f}x).")
+        return 0
+    print(f"\n{len(regressions)} regressions against '{baseline_path}' (threshold {args.threshold:.2f}x):")
+    for name, stage, metric, previous, current in regressions:
+        print(f"  {name} {stage} {metric}: {previous:.6g} -> {current:.6g} ({current / previous:.2f}x)")
+    return 3
+
+if __name__ == "__main__":
+    sys.exit(main())
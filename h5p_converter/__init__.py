@@ -0,0 +1,31 @@
+# Conversion core of the LLM JSON to H5P converter, usable without the Streamlit UI
+from .diagnostics import (
+    check_cancelled, collect_diagnostics, count_metric, merge_diagnostics, notify,
+    record_build_metrics, render_build_metrics, stage_span, BuildCancelled, BuildDiagnostics
+)
+from .archive import compress_segment, crc32_combine, load_template, CompressedSegment, LibraryInfo
+from .images import DEFAULT_TITLE_IMAGE, TitleImage, prepare_title_image
+from .mapping import (
+    create_h5p_content, create_text_normalizer, iter_questions_json,
+    map_multiple_choice, map_questions_to_h5p, map_true_false, normalize_text, question_to_h5p,
+    questions_json_chunks, split_h5p_content,
+    DEFAULT_NORMALIZATION_RULES, MAIN_LIBRARY, QUESTION_LIBRARIES, TYPOGRAPHIC_QUOTE_RULES
+)
+from .model import (
+    load_question_bank, question_from_dict, MultipleChoiceQuestion, Option, TrueFalseQuestion,
+    QUESTION_MODELS
+)
+from .ingest import (
+    iter_json_array_field, validate_json_text, validate_questions, ValidationIssue,
+    QUESTION_SCHEMA, QUESTION_VALIDATORS
+)
+from .packaging import (
+    compress_questions, content_segments, create_h5p_package, export_package,
+    map_questions_segment, map_questions_stream, package_cache_key, package_source_key,
+    prepare_package_layout, process_json_input, process_json_stream, resolve_libraries, write_h5p_package,
+    MappedQuestions, PackageLayout
+)
+from .preview import (
+    filter_questions, issues_by_position, page_count, preview_page, PreviewItem, PREVIEW_STATUSES
+)
+from .jobs import get_build_executor, init_worker, start_build, worker_options, BuildJob, BuildProgress
@@ -0,0 +1,174 @@
+import zlib
+import zipfile
+import io
+import copy
+import json
+import struct
+import logging
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from .diagnostics import stage_span
+
+# Parsed template: raw file bytes, (ZipInfo, compressed data view) per entry and
+# the H5P libraries it ships, by machine name
+LoadedTemplate = namedtuple("LoadedTemplate", ["path", "mtime_ns", "size", "data", "entries", "libraries"])
+
+# H5P library from a template folder's library.json; dependencies are machine names
+LibraryInfo = namedtuple("LibraryInfo", ["machine_name", "major", "minor", "folder", "preloaded", "editor"])
+
+# Process-wide template cache, shared by every Streamlit session and request
+_template_cache = {}
+_template_cache_lock = threading.Lock()
+
+# Function to locate the compressed data of a zip entry inside the archive bytes
+def zip_entry_data_offset(zip_bytes, zip_info):
+    header_end = zip_info.header_offset + zipfile.sizeFileHeader
+    local_header = zip_bytes[zip_info.header_offset:header_end]
+    if len(local_header) != zipfile.sizeFileHeader or local_header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local file header for '{zip_info.filename}'.")
+    name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+    data_offset = header_end + name_length + extra_length
+    if data_offset + zip_info.compress_size > len(zip_bytes):
+        raise zipfile.BadZipFile(f"Truncated data for '{zip_info.filename}'.")
+    return data_offset
+
+# Function to read the name, version and dependencies of a library from its library.json
+def parse_library_json(library_json_bytes, folder):
+    library = json.loads(library_json_bytes.decode('utf-8-sig'))
+    dependency_names = lambda key: tuple(dependency["machineName"] for dependency in library.get(key, []))
+    return LibraryInfo(
+        library["machineName"], library["majorVersion"], library["minorVersion"], folder,
+        dependency_names("preloadedDependencies") + dependency_names("dynamicDependencies"),
+        dependency_names("editorDependencies")
+    )
+
+# Function to load a template once per process, reloading it when the file changes
+def load_template(template_zip_path):
+    path = Path(template_zip_path).resolve()
+    stat = path.stat()
+    with _template_cache_lock:
+        cached = _template_cache.get(path)
+        if cached and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+            return cached
+
+        template_bytes = path.read_bytes()
+        template_view = memoryview(template_bytes)
+        # Later entries with the same name win, as when the zip is read normally
+        entries = {}
+        libraries = {}
+        with zipfile.ZipFile(io.BytesIO(template_bytes), 'r') as template_zip:
+            for item in template_zip.infolist():
+                data_offset = zip_entry_data_offset(template_bytes, item)
+                entries.pop(item.filename, None)
+                entries[item.filename] = (item, template_view[data_offset:data_offset + item.compress_size])
+                folder, _, file_name = item.filename.partition("/")
+                if file_name == "library.json":
+                    library = parse_library_json(template_zip.read(item), folder)
+                    libraries[library.machine_name] = library
+
+        loaded = LoadedTemplate(path, stat.st_mtime_ns, stat.st_size, template_bytes, tuple(entries.values()), libraries)
+        _template_cache[path] = loaded
+        logging.info(f"Loaded template '{path}' with {len(entries)} entries.")
+        return loaded
+
+# Function to copy an already compressed entry into a zip opened for writing
+def write_raw_zip_entry(target_zip, zip_info, *raw_chunks):
+    raw_info = copy.copy(zip_info)
+    # CRC and sizes are known up front, so they go into the local header
+    # instead of a trailing data descriptor
+    raw_info.flag_bits &= ~0x08
+    raw_info.header_offset = target_zip.fp.tell()
+    target_zip.fp.write(raw_info.FileHeader())
+    for raw_bytes in raw_chunks:
+        target_zip.fp.write(raw_bytes)
+    # Register the entry so ZipFile.close() writes it to the central directory
+    target_zip.filelist.append(raw_info)
+    target_zip.NameToInfo[raw_info.filename] = raw_info
+    target_zip.start_dir = target_zip.fp.tell()
+
+# Fixed entry timestamp so identical inputs produce byte-identical packages
+FIXED_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Function to create zip entry metadata that does not depend on build time or platform
+def fixed_zip_info(entry_name, compress_type=zipfile.ZIP_DEFLATED):
+    zip_info = zipfile.ZipInfo(entry_name, date_time=FIXED_ZIP_DATE_TIME)
+    zip_info.compress_type = compress_type
+    zip_info.create_system = 3
+    zip_info.external_attr = 0o644 << 16
+    return zip_info
+
+# Function to write a string into a zip entry in bounded chunks
+def write_text_zip_entry(target_zip, entry_name, text, chunk_size=64 * 1024):
+    with target_zip.open(fixed_zip_info(entry_name), 'w') as entry:
+        for start in range(0, len(text), chunk_size):
+            entry.write(text[start:start + chunk_size].encode('utf-8'))
+
+# Independently deflated piece of an entry: raw deflate data (sync-flushed
+# unless final), plus CRC-32 and length of the uncompressed bytes
+CompressedSegment = namedtuple("CompressedSegment", ["data", "crc", "size"])
+
+# Function to deflate text chunks into a segment that can be concatenated with others
+def compress_segment(text_chunks, final=False):
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = []
+    crc = 0
+    size = 0
+    with stage_span("zip"):
+        for chunk in text_chunks:
+            data = chunk.encode('utf-8')
+            crc = zlib.crc32(data, crc)
+            size += len(data)
+            compressed.append(compressor.compress(data))
+        # A sync flush ends on a byte boundary without a final block, so the next
+        # segment's deflate blocks can follow directly
+        compressed.append(compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH))
+    return CompressedSegment(b"".join(compressed), crc, size)
+
+# Functions for GF(2) matrix arithmetic used by crc32_combine (port of zlib's)
+def _gf2_matrix_times(matrix, vector):
+    total = 0
+    idx = 0
+    while vector:
+        if vector & 1:
+            total ^= matrix[idx]
+        vector >>= 1
+        idx += 1
+    return total
+
+def _gf2_matrix_square(matrix):
+    return [_gf2_matrix_times(matrix, row) for row in matrix]
+
+# Function to compute the CRC-32 of A+B from crc(A), crc(B) and len(B)
+def crc32_combine(crc1, crc2, len2):
+    if len2 <= 0:
+        return crc1
+    odd = [0xEDB88320] + [1 << n for n in range(31)]  # Operator for one zero bit
+    even = _gf2_matrix_square(odd)  # Two zero bits
+    odd = _gf2_matrix_square(even)  # Four zero bits
+    while True:
+        even = _gf2_matrix_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_matrix_times(even, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+        odd = _gf2_matrix_square(even)
+        if len2 & 1:
+            crc1 = _gf2_matrix_times(odd, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+    return crc1 ^ crc2
+
+# Function to write an entry assembled from compressed segments (the last one final)
+def write_segmented_zip_entry(target_zip, entry_name, segments):
+    zip_info = fixed_zip_info(entry_name)
+    crc = 0
+    for segment in segments:
+        crc = crc32_combine(crc, segment.crc, segment.size)
+    zip_info.CRC = crc
+    zip_info.file_size = sum(segment.size for segment in segments)
+    zip_info.compress_size = sum(len(segment.data) for segment in segments)
+    write_raw_zip_entry(target_zip, zip_info, *(segment.data for segment in segments))
@@ -0,0 +1,168 @@
+import json
+import logging
+import threading
+import time
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+# Raised inside a build whose cancellation was requested; like KeyboardInterrupt it is
+# not an Exception, so the error handlers of the stages do not report it as a failure
+class BuildCancelled(BaseException):
+    pass
+
+# Diagnostics of one build: exclusive time per stage, counters and user-facing messages
+class BuildDiagnostics:
+    def __init__(self, cancel_event=None):
+        self.spans = OrderedDict()  # Stage -> seconds spent in it, excluding nested stages
+        self.counters = OrderedDict()
+        self.messages = []  # (level, text)
+        self._stack = []  # [stage, started] of the open spans, innermost last
+        # Progress, read from other threads while the build runs: plain dict copies
+        # and attribute reads are atomic, so no lock is needed
+        self.entries = {}  # Stage -> times entered (e.g. questions mapped so far)
+        self.stage = None  # Last stage entered (e.g. "map" while questions stream into "zip")
+        self.cancel_event = cancel_event
+
+    # Function to stop the build at the next stage or question once cancellation was requested
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise BuildCancelled()
+
+    # Function to snapshot the progress (last stage, entries per stage) for another thread
+    def progress(self):
+        return self.stage, dict(self.entries)
+
+    @contextmanager
+    def span(self, stage):
+        self.check_cancelled()
+        self.entries[stage] = self.entries.get(stage, 0) + 1
+        now = time.perf_counter()
+        if self._stack:
+            # Pause the enclosing stage while this one runs
+            parent = self._stack[-1]
+            self.spans[parent[0]] = self.spans.get(parent[0], 0.0) + now - parent[1]
+        entry = [stage, now]
+        self._stack.append(entry)
+        self.stage = stage
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._stack.pop()
+            self.spans[stage] = self.spans.get(stage, 0.0) + now - entry[1]
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def message(self, level, text):
+        self.messages.append((level, text))
+
+    # Function to add the diagnostics of a step that ran ahead of this build (e.g. parsing)
+    def merge(self, other):
+        for stage, seconds in other.spans.items():
+            self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+        for name, value in other.counters.items():
+            self.count(name, value)
+        self.messages.extend(other.messages)
+
+    # Function to explain a failed build: its errors, or else the last warning, which
+    # usually says why nothing was built (e.g. no questions found)
+    def failure_reason(self, default="Conversion failed"):
+        errors = [text for level, text in self.messages if level == "error"]
+        warnings = [text for level, text in self.messages if level == "warning"]
+        return "; ".join(errors or warnings[-1:]) or default
+
+    def summary(self):
+        return {
+            "seconds": sum(self.spans.values()),
+            "spans": dict(self.spans),
+            "counters": dict(self.counters),
+            "messages": len(self.messages)
+        }
+
+# Collector of the build running in the current thread or task (None outside a build)
+_current_diagnostics = contextvars.ContextVar("diagnostics", default=None)
+
+# Process-wide totals for the Prometheus-style export
+_diagnostics_totals = {"builds": 0, "spans": {}, "counters": {}}
+_diagnostics_totals_lock = threading.Lock()
+
+LOG_LEVELS = {"info": logging.INFO, "success": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+# Function to report a message to the log and to the user of the current build
+def notify(level, text):
+    logging.log(LOG_LEVELS[level], text)
+    diagnostics = _current_diagnostics.get()
+    if diagnostics is not None:
+        diagnostics.message(level, text)
+
+# Function to time a stage of the current build (a no-op outside a build)
+def stage_span(stage):
+    diagnostics = _current_diagnostics.get()
+    return nullcontext() if diagnostics is None else diagnostics.span(stage)
+
+# Function to add to a counter of the current build
+def count_metric(name, amount=1):
+    diagnostics = _current_diagnostics.get()
+    if diagnostics is not None:
+        diagnostics.count(name, amount)
+
+# Function to stop the current build if its cancellation was requested (for long loops within a stage)
+def check_cancelled():
+    diagnostics = _current_diagnostics.get()
+    if diagnostics is not None:
+        diagnostics.check_cancelled()
+
+# Function to add diagnostics collected earlier (e.g. while parsing ahead of the build) to the current build
+def merge_diagnostics(other):
+    diagnostics = _current_diagnostics.get()
+    if diagnostics is not None:
+        diagnostics.merge(other)
+
+# Function to time each step of an iterator as a stage (e.g. parsing items on demand)
+def timed_iter(iterable, stage):
+    iterator = iter(iterable)
+    while True:
+        with stage_span(stage):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+# Function to add the summary of a finished build to the process-wide totals
+def record_build_metrics(summary):
+    with _diagnostics_totals_lock:
+        _diagnostics_totals["builds"] += 1
+        for section in ("spans", "counters"):
+            totals = _diagnostics_totals[section]
+            for name, value in summary[section].items():
+                totals[name] = totals.get(name, 0) + value
+
+# Function to collect the diagnostics of a build; the summary is logged and added to the totals
+# (an existing collector can be passed in, e.g. to watch the build from another thread; with
+# record=False nothing is logged or added, for steps that are merged into a later build)
+@contextmanager
+def collect_diagnostics(build_name="build", diagnostics=None, record=True):
+    if diagnostics is None:
+        diagnostics = BuildDiagnostics()
+    token = _current_diagnostics.set(diagnostics)
+    try:
+        yield diagnostics
+    finally:
+        _current_diagnostics.reset(token)
+        if record:
+            summary = diagnostics.summary()
+            record_build_metrics(summary)
+            logging.info("build %s", json.dumps({"name": build_name, **summary}, ensure_ascii=False))
+
+# Function to render the process-wide totals in the Prometheus text format
+def render_build_metrics(prefix="h5p"):
+    with _diagnostics_totals_lock:
+        lines = [f"{prefix}_builds_total {_diagnostics_totals['builds']}"]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {value}' for name, value in _diagnostics_totals["spans"].items()]
+        lines += [f"{prefix}_{name}_total {value}" for name, value in _diagnostics_totals["counters"].items()]
+    return "\n".join(lines) + "\n"
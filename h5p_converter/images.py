@@ -0,0 +1,94 @@
+import zipfile
+import io
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+# Pillow is optional: without it uploaded images are embedded unchanged
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .archive import load_template
+from .diagnostics import stage_span
+
+# Title image of the intro page; data=None means the template's own image entry is kept
+TitleImage = namedtuple("TitleImage", ["data", "path", "mime", "width", "height"])
+TITLE_IMAGE_PATH = "images/file-_jmSDW4b9EawjImv.png"  # Relative to 'content/'
+TITLE_IMAGE_SIZE = (52, 52)  # Size declared in content.json
+DEFAULT_TITLE_IMAGE = TitleImage(None, TITLE_IMAGE_PATH, "image/png", *TITLE_IMAGE_SIZE)
+
+# Processed title images, keyed by source content hash (or template identity)
+_title_image_cache = OrderedDict()
+_title_image_cache_lock = threading.Lock()
+TITLE_IMAGE_CACHE_SIZE = 32
+
+# Known image signatures, used when Pillow is not available
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"GIF8", "image/gif", "gif"),
+)
+
+# Function to downscale and re-encode an image as PNG within the declared size
+def downscale_image(image_bytes, max_size=TITLE_IMAGE_SIZE):
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.thumbnail(max_size, Image.LANCZOS)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        output = io.BytesIO()
+        image.save(output, format="PNG", optimize=True)
+        return output.getvalue(), image.width, image.height
+
+# Function to wrap image bytes unchanged, guessing the type from the file signature
+def passthrough_image(image_bytes):
+    for signature, mime, extension in IMAGE_SIGNATURES:
+        if image_bytes.startswith(signature):
+            path = str(Path(TITLE_IMAGE_PATH).with_suffix(f".{extension}"))
+            return TitleImage(image_bytes, path, mime, *TITLE_IMAGE_SIZE)
+    return TitleImage(image_bytes, TITLE_IMAGE_PATH, "image/png", *TITLE_IMAGE_SIZE)
+
+# Function to get the processed title image (uploaded or template default), cached per process
+def prepare_title_image(template_zip_path, user_image_bytes=None):
+    with stage_span("image"):
+        return _prepare_title_image(template_zip_path, user_image_bytes)
+
+def _prepare_title_image(template_zip_path, user_image_bytes):
+    if user_image_bytes:
+        cache_key = ("upload", hashlib.sha256(user_image_bytes).hexdigest())
+    else:
+        if Image is None:
+            return DEFAULT_TITLE_IMAGE
+        template = load_template(template_zip_path)
+        cache_key = ("template", template.path, template.mtime_ns)
+
+    with _title_image_cache_lock:
+        cached = _title_image_cache.get(cache_key)
+        if cached is not None:
+            _title_image_cache.move_to_end(cache_key)
+            return cached
+
+    if user_image_bytes:
+        source_bytes = user_image_bytes
+    else:
+        with zipfile.ZipFile(io.BytesIO(template.data), 'r') as template_zip:
+            source_bytes = template_zip.read(f"content/{TITLE_IMAGE_PATH}")
+
+    if Image is None:
+        title_image = passthrough_image(source_bytes)
+    else:
+        try:
+            image_bytes, width, height = downscale_image(source_bytes)
+            title_image = TitleImage(image_bytes, TITLE_IMAGE_PATH, "image/png", width, height)
+        except Exception as e:
+            logging.warning(f"Could not process title image, embedding it unchanged: {e}")
+            title_image = passthrough_image(source_bytes) if user_image_bytes else DEFAULT_TITLE_IMAGE
+
+    with _title_image_cache_lock:
+        _title_image_cache[cache_key] = title_image
+        while len(_title_image_cache) > TITLE_IMAGE_CACHE_SIZE:
+            _title_image_cache.popitem(last=False)
+    return title_image
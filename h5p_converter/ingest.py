@@ -0,0 +1,226 @@
+import json
+import re
+from collections import namedtuple
+
+from .diagnostics import count_metric
+
+# Patterns for JSON whitespace between tokens and characters that may continue a number
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+JSON_NUMBER_TAIL = re.compile(r'[0-9eE.+\-]*')
+_json_decoder = json.JSONDecoder()
+
+# Function to parse the items of a top-level array field one by one from a text stream (or str)
+def iter_json_array_field(source, field="questions", chunk_size=64 * 1024):
+    if isinstance(source, str):
+        chunks = (source[start:start + chunk_size] for start in range(0, len(source), chunk_size))
+        read_chunk = lambda: next(chunks, "")
+    else:
+        read_chunk = lambda: source.read(chunk_size)
+
+    # Only the unparsed rest of the input is buffered; offset is the input
+    # position of buffer[0], so errors can report absolute positions
+    buffer = ""
+    offset = 0
+    pos = 0
+
+    def fill():
+        nonlocal buffer, offset, pos
+        chunk = read_chunk()
+        if not chunk:
+            return False
+        count_metric("bytes_in", len(chunk.encode('utf-8')))
+        offset += pos
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            pos = JSON_WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) or not fill():
+                return
+
+    def expect(chars, expected):
+        nonlocal pos
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] not in chars:
+            found = repr(buffer[pos]) if pos < len(buffer) else "end of input"
+            raise ValueError(f"Expected {expected} at character {offset + pos}, found {found}.")
+        pos += 1
+        return buffer[pos - 1]
+
+    def peek(char):
+        skip_whitespace()
+        return buffer.startswith(char, pos)
+
+    # Only whitespace may follow the top-level object, as with json.loads
+    def expect_end():
+        skip_whitespace()
+        if pos < len(buffer):
+            raise ValueError(f"Unexpected data at character {offset + pos}.")
+
+    def decode_value():
+        nonlocal pos
+        skip_whitespace()
+        while True:
+            try:
+                value, end = _json_decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # The value may just be cut off at the end of the buffer
+                if fill():
+                    continue
+                raise ValueError(f"{e.msg} at character {offset + e.pos}.") from None
+            # A number at the end of the buffer may continue in the next chunk
+            if isinstance(value, (int, float)) and JSON_NUMBER_TAIL.fullmatch(buffer, end) and fill():
+                continue
+            pos = end
+            return value
+
+    expect("{", "a JSON object")
+    if peek("}"):
+        expect("}", "'}'")
+        expect_end()
+        return
+    # Items are yielded as they are parsed, so json.loads' "last key wins" cannot
+    # be followed; a repeated field is rejected instead of yielding both arrays
+    seen_field = False
+    while True:
+        skip_whitespace()
+        key_pos = offset + pos
+        key = decode_value()
+        if not isinstance(key, str):
+            raise ValueError(f"Expected a property name at character {key_pos}.")
+        expect(":", "':'")
+        if key == field:
+            if seen_field:
+                raise ValueError(f"Duplicate '{field}' field at character {key_pos}.")
+            seen_field = True
+            expect("[", f"'{field}' to be a list")
+            if peek("]"):
+                expect("]", "']'")
+            else:
+                while True:
+                    yield decode_value()
+                    if expect(",]", "',' or ']'") == "]":
+                        break
+        else:
+            decode_value()
+        if expect(",}", "',' or '}'") == "}":
+            expect_end()
+            return
+
+# One problem found in the input: 1-based question index (None for the whole document), field and reason
+ValidationIssue = namedtuple("ValidationIssue", ["index", "field", "reason"])
+
+# Input schema per question type: field -> (expected type, required)
+QUESTION_SCHEMA = {
+    "MultipleChoice": {
+        "question": (str, True),
+        "options": (list, True),
+    },
+    "TrueFalse": {
+        "question": (str, True),
+        "correct_answer": (bool, True),
+        "feedback_correct": (str, False),
+        "feedback_incorrect": (str, False),
+    },
+}
+OPTION_SCHEMA = {
+    "text": (str, True),
+    "is_correct": (bool, False),
+}
+SCHEMA_TYPE_NAMES = {str: "a string", list: "a list", bool: "true or false"}
+
+# Function to compile a field schema into a checker appending issues for one JSON object
+def compile_object_validator(schema):
+    checks = tuple((field, expected, required, SCHEMA_TYPE_NAMES[expected]) for field, (expected, required) in schema.items())
+
+    def validate(obj, index, prefix, issues):
+        for field, expected, required, type_name in checks:
+            value = obj.get(field)
+            if value is None:
+                if required:
+                    issues.append(ValidationIssue(index, prefix + field, "is missing"))
+            # Exact type check, so that 0/1 do not pass as booleans
+            elif type(value) is not expected:
+                issues.append(ValidationIssue(index, prefix + field, f"must be {type_name}"))
+            elif expected is str and not value.strip():
+                issues.append(ValidationIssue(index, prefix + field, "is empty"))
+
+    return validate
+
+# Function to compile the per-type question validators from the schema tables
+def compile_question_validators(question_schema=QUESTION_SCHEMA, option_schema=OPTION_SCHEMA):
+    validate_option = compile_object_validator(option_schema)
+
+    def validate_options(question, index, issues):
+        options = question.get("options")
+        if type(options) is not list:
+            return  # Already reported by the field checks
+        if not options:
+            issues.append(ValidationIssue(index, "options", "has no options"))
+            return
+        has_correct = False
+        for option_idx, option in enumerate(options):
+            prefix = f"options[{option_idx}]"
+            if not isinstance(option, dict):
+                issues.append(ValidationIssue(index, prefix, "must be a JSON object"))
+                continue
+            validate_option(option, index, prefix + ".", issues)
+            has_correct = has_correct or option.get("is_correct") is True
+        if not has_correct:
+            issues.append(ValidationIssue(index, "options", "has no correct option"))
+
+    validators = {}
+    for q_type, schema in question_schema.items():
+        validate_fields = compile_object_validator(schema)
+        if q_type == "MultipleChoice":
+            def validate(question, index, issues, validate_fields=validate_fields):
+                validate_fields(question, index, "", issues)
+                validate_options(question, index, issues)
+        else:
+            validate = lambda question, index, issues, validate_fields=validate_fields: validate_fields(question, index, "", issues)
+        validators[q_type] = validate
+    return validators
+
+# Question validators, compiled once per process
+QUESTION_VALIDATORS = compile_question_validators()
+
+# Function to check a whole bank in one pass and report every problem found
+def validate_questions(llm_questions, validators=QUESTION_VALIDATORS, issues=None):
+    issues = [] if issues is None else issues
+    for idx, question in enumerate(llm_questions, start=1):
+        if not isinstance(question, dict):
+            issues.append(ValidationIssue(idx, None, f"has type {type(question).__name__}, not a JSON object"))
+            continue
+        q_type = question.get("type")
+        validate = validators.get(q_type.strip() if isinstance(q_type, str) else q_type)
+        if validate is None:
+            reason = "is missing" if q_type is None else f"'{q_type}' is not one of {', '.join(validators)}"
+            issues.append(ValidationIssue(idx, "type", reason))
+            continue
+        validate(question, idx, issues)
+    return issues
+
+# Function to validate a JSON document (stream or str) incrementally, including syntax errors
+def validate_json_text(source, validators=QUESTION_VALIDATORS):
+    question_count = 0
+
+    def count(questions):
+        nonlocal question_count
+        for question in questions:
+            question_count += 1
+            yield question
+
+    issues = []
+    try:
+        validate_questions(count(iter_json_array_field(source)), validators, issues)
+    except ValueError as e:
+        # Questions before the syntax error keep their issues, the rest of the
+        # document cannot be read
+        issues.append(ValidationIssue(None, None, str(e)))
+        return issues
+    if not question_count:
+        issues.append(ValidationIssue(None, "questions", "has no questions"))
+    return issues
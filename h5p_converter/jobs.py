@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .diagnostics import collect_diagnostics, notify, BuildCancelled, BuildDiagnostics
+
+# Builds share one small thread pool per process: the template, title image and
+# package caches live in this process, and zlib and Pillow release the GIL
+MAX_BUILD_WORKERS = min(4, os.cpu_count() or 1)
+_build_executor = None
+_build_executor_lock = threading.Lock()
+
+# Per-process build options of pool workers (batch and server), set once by init_worker
+worker_options = {}
+
+# Snapshot of a running build: current stage, questions mapped so far (out of total, if known)
+BuildProgress = namedtuple("BuildProgress", ["stage", "questions_done", "questions_total", "seconds"])
+
+# Function to get the shared build executor, created on first use
+def get_build_executor():
+    global _build_executor
+    with _build_executor_lock:
+        if _build_executor is None:
+            _build_executor = ThreadPoolExecutor(max_workers=MAX_BUILD_WORKERS, thread_name_prefix="h5p-build")
+        return _build_executor
+
+# Function to initialize a worker process with the shared build options (a pool initializer)
+def init_worker(options):
+    worker_options.update(options)
+
+# Package build running in the background; watched and cancelled from other threads
+class BuildJob:
+    def __init__(self, key, build_name, questions_total=None):
+        self.key = key  # Identifies the inputs and settings, so identical requests can share the job
+        self.build_name = build_name
+        self.questions_total = questions_total
+        self.cancel_event = threading.Event()
+        self.diagnostics = BuildDiagnostics(self.cancel_event)
+        self.started = None
+        self.finished = None
+        self.future = None
+
+    def run(self, build, *args, **kwargs):
+        self.started = time.perf_counter()
+        with collect_diagnostics(self.build_name, self.diagnostics):
+            try:
+                return build(*args, **kwargs)
+            except BuildCancelled:
+                notify("warning", f"Build of '{self.build_name}' was cancelled.")
+                return None
+            finally:
+                self.finished = time.perf_counter()
+
+    # Function to request cancellation; the build stops at its next stage or question
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()  # Not started yet: it never runs
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    # Function to get the result of a finished build (None if it failed or was cancelled)
+    def result(self):
+        if self.future.cancelled():
+            return None
+        return self.future.result()
+
+    def progress(self):
+        stage, entries = self.diagnostics.progress()
+        if self.started is None:
+            seconds = 0.0
+        else:
+            seconds = (self.finished or time.perf_counter()) - self.started
+        return BuildProgress(stage, entries.get("map", 0), self.questions_total, seconds)
+
+# Function to run a build in the background; the build's messages and timings go to job.diagnostics
+def start_build(key, build_name, build, *args, questions_total=None, **kwargs):
+    job = BuildJob(key, build_name, questions_total)
+    job.future = get_build_executor().submit(job.run, build, *args, **kwargs)
+    return job
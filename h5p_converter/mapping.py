@@ -0,0 +1,434 @@
+import json
+import unicodedata
+import re
+
+from .diagnostics import notify, stage_span
+from .images import DEFAULT_TITLE_IMAGE
+from .model import generate_sub_content_id, question_from_dict, QUESTION_MODEL_CLASSES
+
+# Main library of the package and the H5P library behind each question type
+MAIN_LIBRARY = "H5P.QuestionSet"
+QUESTION_LIBRARIES = {
+    "MultipleChoice": "H5P.MultiChoice",
+    "TrueFalse": "H5P.TrueFalse",
+}
+
+# Text substitutions applied to every user-provided string during mapping
+DEFAULT_NORMALIZATION_RULES = (
+    ("ß", "ss"),
+)
+
+# Optional substitutions replacing typographic quotes with plain ones
+TYPOGRAPHIC_QUOTE_RULES = (
+    ("\u201c", '"'), ("\u201d", '"'), ("\u201e", '"'),
+    ("\u2018", "'"), ("\u2019", "'"), ("\u201a", "'"),
+)
+
+# Rule tables up to this size are applied with str.replace, which is much faster than
+# str.translate with a dict table on non-ASCII text; larger tables use translate
+MAX_REPLACE_RULES = 8
+
+# Function to build a normalizer from a rule table and optional Unicode form (e.g. "NFC")
+def create_text_normalizer(rules=DEFAULT_NORMALIZATION_RULES, unicode_form=None):
+    single_char_rules = {old: new for old, new in rules if len(old) == 1}
+    replace_rules = [(old, new) for old, new in rules if len(old) != 1]
+    translation_table = str.maketrans(single_char_rules)
+
+    # Chained replacements equal a single translate pass only if no replacement
+    # introduces a character that another rule would then replace
+    chained = len(single_char_rules) <= MAX_REPLACE_RULES and not any(
+        old in new for old in single_char_rules for new in single_char_rules.values()
+    )
+    if chained:
+        replace_rules = list(single_char_rules.items()) + replace_rules
+
+    def normalize(value):
+        if not isinstance(value, str):
+            return value
+        if unicode_form:
+            value = unicodedata.normalize(unicode_form, value)
+        if not chained:
+            value = value.translate(translation_table)
+        for old, new in replace_rules:
+            if old in value:
+                value = value.replace(old, new)
+        return value
+
+    return normalize
+
+# Default normalizer used by the mapping functions
+normalize_text = create_text_normalizer()
+
+# Function to map MultipleChoice options to H5P answers
+def map_multiple_choice_answers(options, normalize=normalize_text):
+    answers = []
+    for option in options:
+        answer = {
+            "text": normalize(option.get("text", "")),
+            "correct": option.get("is_correct", False),
+            "tipsAndFeedback": {
+                "tip": "",
+                "chosenFeedback": f"<div>{normalize(option.get('feedback', ''))}</div>\n",
+                "notChosenFeedback": ""
+            }
+        }
+        answers.append(answer)
+    return answers
+
+# Function to map MultipleChoice questions to H5P format
+def map_multiple_choice(question, normalize=normalize_text, sub_content_id=None):
+    # Without a position the id is derived from the question alone, so builds stay reproducible
+    if sub_content_id is None:
+        sub_content_id = generate_sub_content_id(question, 0)
+    try:
+        h5p_question = {
+            "library": "H5P.MultiChoice 1.16",
+            "params": {
+                "question": normalize(question.get("question", "Keine Frage gestellt.")),
+                "answers": [],
+                "behaviour": {
+                    "singleAnswer": True,
+                    "enableRetry": False,
+                    "enableSolutionsButton": False,
+                    "enableCheckButton": True,
+                    "type": "auto",
+                    "singlePoint": False,
+                    "randomAnswers": True,  # This will be controlled globally
+                    "showSolutionsRequiresInput": True,
+                    "confirmCheckDialog": False,
+                    "confirmRetryDialog": False,
+                    "autoCheck": False,
+                    "passPercentage": 100,
+                    "showScorePoints": True
+                },
+                "media": {
+                    "disableImageZooming": False
+                },
+                "overallFeedback": [
+                    {
+                        "from": 0,
+                        "to": 100
+                    }
+                ],
+                "UI": {
+                    "checkAnswerButton": "Überprüfen",
+                    "submitAnswerButton": "Absenden",
+                    "showSolutionButton": "Lösung anzeigen",
+                    "tryAgainButton": "Wiederholen",
+                    "tipsLabel": "Hinweis anzeigen",
+                    "scoreBarLabel": "Du hast :num von :total Punkten erreicht.",
+                    "tipAvailable": "Hinweis verfügbar",
+                    "feedbackAvailable": "Rückmeldung verfügbar",
+                    "readFeedback": "Rückmeldung vorlesen",
+                    "wrongAnswer": "Falsche Antwort",
+                    "correctAnswer": "Richtige Antwort",
+                    "shouldCheck": "Hätte gewählt werden müssen",
+                    "shouldNotCheck": "Hätte nicht gewählt werden sollen",
+                    "noInput": "Bitte antworte, bevor du die Lösung ansiehst",
+                    "a11yCheck": "Die Antworten überprüfen. Die Auswahlen werden als richtig, falsch oder fehlend markiert.",
+                    "a11yShowSolution": "Die Lösung anzeigen. Die richtigen Lösungen werden in der Aufgabe angezeigt.",
+                    "a11yRetry": "Die Aufgabe wiederholen. Alle Versuche werden zurückgesetzt und die Aufgabe wird erneut gestartet."
+                },
+                "confirmCheck": {
+                    "header": "Beenden?",
+                    "body": "Ganz sicher beenden?",
+                    "cancelLabel": "Abbrechen",
+                    "confirmLabel": "Beenden"
+                },
+                "confirmRetry": {
+                    "header": "Wiederholen?",
+                    "body": "Ganz sicher wiederholen?",
+                    "cancelLabel": "Abbrechen",
+                    "confirmLabel": "Bestätigen"
+                }
+            },
+            "subContentId": sub_content_id,
+            "metadata": {
+                "contentType": "Multiple Choice",
+                "license": "U",
+                "title": "Multiple Choice",
+                "authors": [],
+                "changes": [],
+                "extraTitle": "Multiple Choice"
+            }
+        }
+
+        options = question.get("options", [])
+        if not isinstance(options, list):
+            notify("warning", f"'options' is not a list in MultipleChoice question: {question.get('question', 'Keine Frage')}")
+            return h5p_question
+
+        h5p_question["params"]["answers"] = map_multiple_choice_answers(options, normalize)
+
+        return h5p_question
+
+    except Exception as e:
+        notify("error", f"Error mapping MultipleChoice question: {e}")
+        return {}
+
+# Function to map TrueFalse questions to H5P format
+def map_true_false(question, normalize=normalize_text, sub_content_id=None):
+    if sub_content_id is None:
+        sub_content_id = generate_sub_content_id(question, 0)
+    try:
+        correct_answer = question.get("correct_answer", False)
+        feedback_correct = normalize(question.get("feedback_correct", ""))
+        feedback_incorrect = normalize(question.get("feedback_incorrect", ""))
+
+        h5p_question = {
+            "library": "H5P.TrueFalse 1.8",
+            "params": {
+                "question": normalize(question.get("question", "Keine Frage gestellt.")),
+                "correct": "true" if correct_answer else "false",
+                "behaviour": {
+                    "enableRetry": False,
+                    "enableSolutionsButton": False,
+                    "enableCheckButton": True,
+                    "confirmCheckDialog": False,
+                    "confirmRetryDialog": False,
+                    "autoCheck": False,
+                    "feedbackOnCorrect": feedback_correct,
+                    "feedbackOnWrong": feedback_incorrect
+                },
+                "media": {
+                    "disableImageZooming": False
+                },
+                "l10n": {
+                    "trueText": "Wahr",
+                    "falseText": "Falsch",
+                    "score": "Du hast @score von @total Punkten erreicht.",
+                    "checkAnswer": "Überprüfen",
+                    "submitAnswer": "Absenden",
+                    "showSolutionButton": "Lösung anzeigen",
+                    "tryAgain": "Wiederholen",
+                    "wrongAnswerMessage": "Falsche Antwort",
+                    "correctAnswerMessage": "Richtige Antwort",
+                    "scoreBarLabel": "Du hast :num von :total Punkten erreicht.",
+                    "a11yCheck": "Die Antworten überprüfen. Die Antwort wird als richtig, falsch oder unbeantwortet markiert.",
+                    "a11yShowSolution": "Die Lösung anzeigen. Die richtige Lösung wird in der Aufgabe angezeigt.",
+                    "a11yRetry": "Die Aufgabe wiederholen. Alle Versuche werden zurückgesetzt, und die Aufgabe wird erneut gestartet."
+                },
+                "confirmCheck": {
+                    "header": "Beenden?",
+                    "body": "Ganz sicher beenden?",
+                    "cancelLabel": "Abbrechen",
+                    "confirmLabel": "Beenden"
+                },
+                "confirmRetry": {
+                    "header": "Wiederholen?",
+                    "body": "Ganz sicher wiederholen?",
+                    "cancelLabel": "Abbrechen",
+                    "confirmLabel": "Bestätigen"
+                }
+            },
+            "subContentId": sub_content_id,
+            "metadata": {
+                "contentType": "True/False Question",
+                "license": "U",
+                "title": "Richtig Falsch",
+                "authors": [],
+                "changes": [],
+                "extraTitle": "Richtig Falsch"
+            }
+        }
+
+        return h5p_question
+
+    except Exception as e:
+        notify("error", f"Error mapping TrueFalse question: {e}")
+        return {}
+
+# Function to map questions to H5P format
+def map_questions_to_h5p(llm_questions, source_name, normalize=normalize_text):
+    with stage_span("map"):
+        return _map_questions_to_h5p(llm_questions, source_name, normalize)
+
+def _map_questions_to_h5p(llm_questions, source_name, normalize):
+    h5p_questions = []
+    for idx, question in enumerate(llm_questions, start=1):
+        q_type = question.get("type", "").strip()
+        if q_type == "MultipleChoice":
+            h5p_q = map_multiple_choice(question, normalize, generate_sub_content_id(question, idx))
+        elif q_type == "TrueFalse":
+            h5p_q = map_true_false(question, normalize, generate_sub_content_id(question, idx))
+        else:
+            notify("warning", f"Unsupported question type '{q_type}' in '{source_name}'. Skipping question #{idx}.")
+            continue  # Skip unsupported question types
+        if h5p_q:  # Only append if mapping was successful
+            h5p_questions.append(h5p_q)
+    notify("info", f"Mapped {len(h5p_questions)} questions from '{source_name}'.")
+    return h5p_questions
+
+# Function to create H5P content structure with customization
+def create_h5p_content(questions, title, randomization, pool_size, pass_percentage, title_image=DEFAULT_TITLE_IMAGE):
+    h5p_content = {
+        "introPage": {
+            "showIntroPage": True,
+            "startButtonText": "Quiz starten",
+            "title": title,
+            "introduction": (
+                "<p style=\"text-align:center\"><strong>Starten Sie das Quiz, um Ihr Wissen zu testen.</strong></p>"
+                "<p style=\"text-align:center\"> </p>"
+                f"<p style=\"text-align:center\"> <strong>Pro Runde werden zufällig {pool_size} Fragen angezeigt.</strong></p>"
+                "<p style=\"text-align:center\"><strong>Wiederholen Sie die Übung, um weitere Fragen zu beantworten.</strong></p>"
+            ),
+            "backgroundImage": {
+                "path": title_image.path,
+                "mime": title_image.mime,
+                "copyright": {
+                    "license": "U"
+                },
+                "width": title_image.width,
+                "height": title_image.height
+            }
+        },
+        "progressType": "textual",
+        "passPercentage": pass_percentage,
+        "disableBackwardsNavigation": True,
+        "randomQuestions": randomization,
+        "endGame": {
+            "showResultPage": True,
+            "showSolutionButton": True,
+            "showRetryButton": True,
+            "noResultMessage": "Quiz beendet",
+            "message": "Dein Ergebnis:",
+            "scoreBarLabel": "Du hast @score von @total Punkten erreicht.",
+            "overallFeedback": [
+                {
+                    "from": 0,
+                    "to": 50,
+                    "feedback": "Kein Grund zur Sorge! Tipp: Schau dir die Lösungen an, bevor du in die nächste Runde startest."
+                },
+                {
+                    "from": 51,
+                    "to": 75,
+                    "feedback": "Du weisst schon einiges über das Thema. Mit jeder Wiederholung kannst du dich steigern."
+                },
+                {
+                    "from": 76,
+                    "to": 100,
+                    "feedback": "Gut gemacht!"
+                }
+            ],
+            "solutionButtonText": "Lösung anzeigen",
+            "retryButtonText": "Nächste Runde",
+            "finishButtonText": "Beenden",
+            "submitButtonText": "Absenden",
+            "showAnimations": False,
+            "skippable": False,
+            "skipButtonText": "Video überspringen"
+        },
+        "override": {
+            "checkButton": True
+        },
+        "texts": {
+            "prevButton": "Zurück",
+            "nextButton": "Weiter",
+            "finishButton": "Beenden",
+            "submitButton": "Absenden",
+            "textualProgress": "Frage @current von @total",
+            "jumpToQuestion": "Frage %d von %total",
+            "questionLabel": "Frage",
+            "readSpeakerProgress": "Frage @current von @total",
+            "unansweredText": "Unbeantwortet",
+            "answeredText": "Beantwortet",
+            "currentQuestionText": "Aktuelle Frage",
+            "navigationLabel": "Fragen"
+        },
+        "poolSize": pool_size,
+        "questions": questions
+    }
+    return h5p_content
+
+# Placeholder for per-question fields inside pre-serialized question templates
+FIELD_PLACEHOLDER = "@@H5P_FIELD_{}@@"
+FIELD_PLACEHOLDER_PATTERN = re.compile(r'"@@H5P_FIELD_(\w+)@@"')
+
+# Pre-serialized question templates, compiled once per library
+_question_templates = {}
+
+# Function to compile a mapped question into literal JSON fragments and field slots
+def compile_question_template(h5p_question, indent_level):
+    indent = " " * (4 * indent_level)
+    question_str = json.dumps(h5p_question, ensure_ascii=False, indent=4).replace("\n", "\n" + indent)
+    parts = FIELD_PLACEHOLDER_PATTERN.split(question_str)
+    literals = parts[0::2]
+    fields = []
+    for literal, field_name in zip(literals, parts[1::2]):
+        # Multi-line values continue at the indentation of the line holding the placeholder
+        line = literal.rsplit("\n", 1)[-1]
+        fields.append((field_name, "\n" + line[:len(line) - len(line.lstrip(" "))]))
+    return literals, fields
+
+# Function to get the compiled template for a library (the l10n tables are fixed per mapper)
+def get_question_template(library, indent_level=2):
+    key = (library, indent_level)
+    template = _question_templates.get(key)
+    if template is None:
+        if library == "MultipleChoice":
+            h5p_question = map_multiple_choice({"question": FIELD_PLACEHOLDER.format("question")})
+            h5p_question["params"]["answers"] = FIELD_PLACEHOLDER.format("answers")
+        else:
+            h5p_question = map_true_false({"question": FIELD_PLACEHOLDER.format("question")})
+            h5p_question["params"]["correct"] = FIELD_PLACEHOLDER.format("correct")
+            h5p_question["params"]["behaviour"]["feedbackOnCorrect"] = FIELD_PLACEHOLDER.format("feedbackOnCorrect")
+            h5p_question["params"]["behaviour"]["feedbackOnWrong"] = FIELD_PLACEHOLDER.format("feedbackOnWrong")
+        h5p_question["subContentId"] = FIELD_PLACEHOLDER.format("subContentId")
+        template = compile_question_template(h5p_question, indent_level)
+        _question_templates[key] = template
+    return template
+
+# Function to render a compiled template with the per-question field values
+def render_question_template(template, values):
+    literals, fields = template
+    chunks = [literals[0]]
+    for (field_name, field_indent), literal in zip(fields, literals[1:]):
+        value_str = json.dumps(values[field_name], ensure_ascii=False, indent=4)
+        if "\n" in value_str:
+            value_str = value_str.replace("\n", field_indent)
+        chunks.append(value_str)
+        chunks.append(literal)
+    return "".join(chunks)
+
+# Function to serialize questions lazily to H5P JSON fragments, skipping the per-question dicts;
+# accepts input question dicts or question models (the machine names of the libraries used
+# are added to the libraries set, if given)
+def iter_questions_json(llm_questions, source_name, normalize=normalize_text, libraries=None):
+    for idx, question in enumerate(llm_questions, start=1):
+        with stage_span("map"):
+            if not isinstance(question, QUESTION_MODEL_CLASSES):
+                question = question_from_dict(question, idx, source_name)
+                if question is None:
+                    continue
+            try:
+                fields = question.h5p_fields(normalize)
+            except Exception as e:
+                notify("error", f"Error mapping {question.type} question #{question.position}: {e}")
+                continue
+            fragment = render_question_template(get_question_template(question.type), fields)
+        if libraries is not None:
+            libraries.add(QUESTION_LIBRARIES[question.type])
+        yield fragment
+
+# Function to build the H5P dict of a question model (for callers that need the parsed form)
+def question_to_h5p(question, normalize=normalize_text):
+    fields = question.h5p_fields(normalize)
+    return json.loads(render_question_template(get_question_template(question.type), fields))
+
+# Function to serialize the settings-dependent JSON before and after the questions list
+def split_h5p_content(title, randomization, pool_size, pass_percentage, title_image=DEFAULT_TITLE_IMAGE):
+    with stage_span("serialize"):
+        placeholder = FIELD_PLACEHOLDER.format("questions")
+        h5p_content = create_h5p_content(placeholder, title, randomization, pool_size, pass_percentage, title_image)
+        content_str = json.dumps(h5p_content, ensure_ascii=False, indent=4)
+        head, tail = content_str.split(f'"{placeholder}"', 1)
+    return head, tail
+
+# Function to yield the serialized questions list chunk by chunk
+def questions_json_chunks(question_fragments):
+    opened = False
+    for fragment in question_fragments:
+        yield ",\n        " if opened else "[\n        "
+        opened = True
+        yield fragment
+    yield "\n    ]" if opened else "[]"
@@ -0,0 +1,155 @@
+import json
+import uuid
+
+from .diagnostics import notify, stage_span, timed_iter
+from .ingest import iter_json_array_field
+
+# Namespace for deterministic subContentIds
+SUB_CONTENT_NAMESPACE = uuid.UUID("5c1f6c1e-2a59-4c1e-9d3b-6f0e8f1b7a42")
+
+# Function to derive a stable subContentId from a question and its position in the bank
+def generate_sub_content_id(question, position):
+    question_key = json.dumps(question, ensure_ascii=False, sort_keys=True, default=str)
+    return str(uuid.uuid5(SUB_CONTENT_NAMESPACE, f"{position}:{question_key}"))
+
+# Function to share one copy of equal strings within a bank (other values are kept as they are)
+def shared_string(strings, value):
+    if strings is None or not isinstance(value, str):
+        return value
+    return strings.setdefault(value, value)
+
+# MultipleChoice option; strings are kept raw and normalized when the H5P output is rendered
+class Option:
+    __slots__ = ("text", "is_correct", "feedback")
+
+    def __init__(self, text, is_correct, feedback):
+        self.text = text
+        self.is_correct = is_correct
+        self.feedback = feedback
+
+    @classmethod
+    def from_dict(cls, option, strings=None):
+        return cls(
+            shared_string(strings, option.get("text", "")),
+            option.get("is_correct", False),
+            shared_string(strings, option.get("feedback", ""))
+        )
+
+    # Function to build the H5P answer of this option
+    def h5p_answer(self, normalize):
+        return {
+            "text": normalize(self.text),
+            "correct": self.is_correct,
+            "tipsAndFeedback": {
+                "tip": "",
+                "chosenFeedback": f"<div>{normalize(self.feedback)}</div>\n",
+                "notChosenFeedback": ""
+            }
+        }
+
+# Questions keep their 1-based position in the input, which validation issues refer to
+class MultipleChoiceQuestion:
+    __slots__ = ("position", "question", "options", "sub_content_id")
+    type = "MultipleChoice"
+
+    def __init__(self, position, question, options, sub_content_id):
+        self.position = position
+        self.question = question
+        self.options = options
+        self.sub_content_id = sub_content_id
+
+    @classmethod
+    def from_dict(cls, question, position, strings=None):
+        # The subContentId depends on the input as given, so it is derived before anything is dropped
+        sub_content_id = generate_sub_content_id(question, position)
+        options = question.get("options", [])
+        if not isinstance(options, list):
+            notify("warning", f"'options' is not a list in MultipleChoice question: {question.get('question', 'Keine Frage')}")
+            options = []
+        return cls(
+            position,
+            shared_string(strings, question.get("question", "Keine Frage gestellt.")),
+            tuple(Option.from_dict(option, strings) for option in options),
+            sub_content_id
+        )
+
+    # Function to extract the per-question fields of the H5P MultipleChoice template
+    def h5p_fields(self, normalize):
+        return {
+            "question": normalize(self.question),
+            "answers": [option.h5p_answer(normalize) for option in self.options],
+            "subContentId": self.sub_content_id
+        }
+
+    # Function to list the user-provided texts, e.g. for searching
+    def texts(self):
+        return [self.question] + [text for option in self.options for text in (option.text, option.feedback)]
+
+class TrueFalseQuestion:
+    __slots__ = ("position", "question", "correct_answer", "feedback_correct", "feedback_incorrect", "sub_content_id")
+    type = "TrueFalse"
+
+    def __init__(self, position, question, correct_answer, feedback_correct, feedback_incorrect, sub_content_id):
+        self.position = position
+        self.question = question
+        self.correct_answer = correct_answer
+        self.feedback_correct = feedback_correct
+        self.feedback_incorrect = feedback_incorrect
+        self.sub_content_id = sub_content_id
+
+    @classmethod
+    def from_dict(cls, question, position, strings=None):
+        return cls(
+            position,
+            shared_string(strings, question.get("question", "Keine Frage gestellt.")),
+            bool(question.get("correct_answer", False)),
+            shared_string(strings, question.get("feedback_correct", "")),
+            shared_string(strings, question.get("feedback_incorrect", "")),
+            generate_sub_content_id(question, position)
+        )
+
+    # Function to extract the per-question fields of the H5P TrueFalse template
+    def h5p_fields(self, normalize):
+        return {
+            "question": normalize(self.question),
+            "correct": "true" if self.correct_answer else "false",
+            "feedbackOnCorrect": normalize(self.feedback_correct),
+            "feedbackOnWrong": normalize(self.feedback_incorrect),
+            "subContentId": self.sub_content_id
+        }
+
+    # Function to list the user-provided texts, e.g. for searching
+    def texts(self):
+        return [self.question, self.feedback_correct, self.feedback_incorrect]
+
+# Model class per input question type
+QUESTION_MODELS = {model.type: model for model in (MultipleChoiceQuestion, TrueFalseQuestion)}
+QUESTION_MODEL_CLASSES = tuple(QUESTION_MODELS.values())
+
+# Function to parse an input question into its model; None (after a message) if it is skipped
+def question_from_dict(question, position, source_name, strings=None):
+    if not isinstance(question, dict):
+        notify("warning", f"Question #{position} in '{source_name}' has type {type(question).__name__}, not a JSON object. Skipping it.")
+        return None
+    q_type = question.get("type", "")
+    q_type = q_type.strip() if isinstance(q_type, str) else q_type
+    model = QUESTION_MODELS.get(q_type)
+    if model is None:
+        notify("warning", f"Unsupported question type '{q_type}' in '{source_name}'. Skipping question #{position}.")
+        return None  # Skip unsupported question types
+    try:
+        return model.from_dict(question, position, strings)
+    except Exception as e:
+        notify("error", f"Error mapping {q_type} question #{position}: {e}")
+        return None
+
+# Function to parse a JSON document (stream or str) into a compact list of question models
+def load_question_bank(source, source_name):
+    strings = {}
+    questions = []
+    for position, item in enumerate(timed_iter(iter_json_array_field(source), "parse"), start=1):
+        with stage_span("parse"):
+            question = question_from_dict(item, position, source_name, strings)
+        if question is not None:
+            questions.append(question)
+    return questions
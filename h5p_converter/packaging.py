@@ -0,0 +1,348 @@
+import json
+import zipfile
+import io
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+from .archive import (
+    compress_segment, fixed_zip_info, load_template, write_raw_zip_entry,
+    write_segmented_zip_entry, write_text_zip_entry
+)
+from .diagnostics import check_cancelled, count_metric, notify, stage_span, timed_iter
+from .images import TITLE_IMAGE_PATH, prepare_title_image
+from .ingest import iter_json_array_field
+from .mapping import (
+    iter_questions_json, normalize_text, questions_json_chunks, split_h5p_content,
+    MAIN_LIBRARY, QUESTION_LIBRARIES
+)
+
+# Function to resolve the libraries a package needs from the template's library.json files;
+# returns the library folders to ship and the runtime libraries in dependency order
+def resolve_libraries(template, used_libraries, include_editor=True):
+    runtime = []
+    visited = set()
+    missing = set()
+
+    def visit(machine_name, editor_only):
+        library = template.libraries.get(machine_name)
+        if library is None:
+            missing.add(machine_name)
+            return
+        key = (machine_name, editor_only)
+        if key in visited or (machine_name, False) in visited:
+            return
+        visited.add(key)
+        for dependency in library.preloaded:
+            visit(dependency, editor_only)
+        if include_editor:
+            for dependency in library.editor:
+                visit(dependency, True)
+        if not editor_only:
+            runtime.append(library)
+
+    for machine_name in [MAIN_LIBRARY, *sorted(used_libraries)]:
+        visit(machine_name, False)
+    if missing:
+        notify("warning", f"The template does not contain the libraries {', '.join(sorted(missing))}.")
+
+    folders = {template.libraries[machine_name].folder for machine_name, _ in visited}
+    return folders, runtime
+
+# Function to stream an H5P package into any writable binary sink (file, socket, response)
+# (content_json is a string, or a list of CompressedSegment from content_segments();
+# libraries are the question libraries used, None for all that the converter supports)
+def write_h5p_package(output_stream, content_json, template_zip_path, title, user_image_bytes=None, title_image=None, libraries=None, content_only=False):
+    # Load the template zip file (parsed once per process)
+    template = load_template(template_zip_path)
+    if title_image is None:
+        title_image = prepare_title_image(template_zip_path, user_image_bytes)
+    template_image_entry = f"content/{TITLE_IMAGE_PATH}"
+
+    # Only the libraries the content depends on are shipped, and none at all
+    # for platforms that already have them installed
+    if libraries is None:
+        libraries = QUESTION_LIBRARIES.values()
+    library_folders, runtime_libraries = resolve_libraries(template, libraries)
+    if content_only:
+        library_folders = set()
+    library_names = {library.folder for library in template.libraries.values()}
+
+    # Non-seekable sinks are supported: zipfile falls back to data descriptors
+    with zipfile.ZipFile(output_stream, 'w', zipfile.ZIP_DEFLATED) as new_zip:
+        # Copy the needed contents from the template zip to the new zip as
+        # their existing compressed streams (no inflate/deflate round trip)
+        for item, raw_bytes in template.entries:
+            check_cancelled()
+            # The template image is replaced by the processed one, never duplicated
+            if title_image.data is not None and item.filename == template_image_entry:
+                continue
+            folder = item.filename.partition("/")[0]
+            if folder in library_names and folder not in library_folders:
+                continue
+            write_raw_zip_entry(new_zip, item, raw_bytes)
+
+        # **Begin Image Replacement**
+        if title_image.data is not None:
+            # Images are already compressed, so they are stored as is
+            new_zip.writestr(fixed_zip_info(f"content/{title_image.path}", zipfile.ZIP_STORED), title_image.data)
+            if user_image_bytes:
+                notify("info", "Uploaded image has been successfully integrated into the H5P package.")
+        # **End Image Replacement**
+
+        # Add content.json to the 'content/' folder; settings-dependent entries
+        # come last so everything before them is identical between re-exports
+        if isinstance(content_json, str):
+            write_text_zip_entry(new_zip, 'content/content.json', content_json)
+        else:
+            write_segmented_zip_entry(new_zip, 'content/content.json', content_json)
+
+        # Create h5p.json with dynamic titles
+        h5p_content = {
+            "embedTypes": ["iframe"],
+            "language": "en",
+            "license": "U",
+            "extraTitle": title,  # Dynamic title
+            "title": title,        # Dynamic title
+            "mainLibrary": MAIN_LIBRARY,
+            "preloadedDependencies": [
+                {"machineName": library.machine_name, "majorVersion": library.major, "minorVersion": library.minor}
+                for library in runtime_libraries
+            ],
+            "defaultLanguage": "de"
+        }
+
+        h5p_json_str = json.dumps(h5p_content, indent=4)
+        # Add h5p.json to the root of the zip
+        new_zip.writestr(fixed_zip_info('h5p.json'), h5p_json_str.encode('utf-8'))
+
+# Function to create H5P package in memory, or stream it into output_stream if given
+def create_h5p_package(content_json, template_zip_path, title, user_image_bytes=None, output_stream=None, title_image=None, libraries=None, content_only=False):
+    try:
+        if output_stream is not None:
+            # Only seekable sinks can tell how much was written
+            start = output_stream.tell() if getattr(output_stream, "seekable", lambda: False)() else None
+            with stage_span("zip"):
+                write_h5p_package(output_stream, content_json, template_zip_path, title, user_image_bytes=user_image_bytes, title_image=title_image, libraries=libraries, content_only=content_only)
+            if start is not None:
+                count_metric("bytes_out", output_stream.tell() - start)
+            return True
+
+        in_memory_zip = io.BytesIO()
+        with stage_span("zip"):
+            write_h5p_package(in_memory_zip, content_json, template_zip_path, title, user_image_bytes=user_image_bytes, title_image=title_image, libraries=libraries, content_only=content_only)
+        count_metric("bytes_out", in_memory_zip.tell())
+        return in_memory_zip.getvalue()
+
+    except FileNotFoundError:
+        notify("error", f"Template zip file not found at '{template_zip_path}'. Please ensure the path is correct.")
+        return None
+    except Exception as e:
+        notify("error", f"Error creating H5P package: {e}")
+        return None
+
+# Content-addressed cache of finished packages, bounded by total size
+_package_cache = OrderedDict()
+_package_cache_bytes = 0
+_package_cache_lock = threading.Lock()
+PACKAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Function to hash everything a package depends on except the quiz settings
+def package_source_key(questions_bytes, template_zip_path, user_image_bytes=None):
+    template = load_template(template_zip_path)
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(template.path), template.mtime_ns, template.size]).encode('utf-8'))
+    digest.update(hashlib.sha256(user_image_bytes or b"").digest())
+    digest.update(hashlib.sha256(questions_bytes).digest())
+    return digest.hexdigest()
+
+# Function to compute the cache key (and ETag) of a package from its source key and settings
+def package_cache_key(source_key, title, randomization, pool_size, pass_percentage, content_only=False):
+    settings = json.dumps([source_key, title, randomization, pool_size, pass_percentage, content_only], ensure_ascii=False, default=str)
+    return hashlib.sha256(settings.encode('utf-8')).hexdigest()
+
+# Function to look up a finished package in the cache
+def get_cached_package(cache_key):
+    with _package_cache_lock:
+        package_bytes = _package_cache.get(cache_key)
+        if package_bytes is not None:
+            _package_cache.move_to_end(cache_key)
+        return package_bytes
+
+# Function to store a finished package, evicting the least recently used ones over budget
+def store_cached_package(cache_key, package_bytes):
+    global _package_cache_bytes
+    if len(package_bytes) > PACKAGE_CACHE_MAX_BYTES // 4:
+        return
+    with _package_cache_lock:
+        if cache_key in _package_cache:
+            return
+        _package_cache[cache_key] = package_bytes
+        _package_cache_bytes += len(package_bytes)
+        while _package_cache_bytes > PACKAGE_CACHE_MAX_BYTES:
+            _, evicted = _package_cache.popitem(last=False)
+            _package_cache_bytes -= len(evicted)
+
+# Function to return a cached package like a fresh build would (bytes, or True once written to
+# output_stream); None on a cache miss
+def reuse_cached_package(cache_key, source_name, output_stream=None):
+    cached_package = get_cached_package(cache_key)
+    if cached_package is None:
+        return None
+    notify("info", f"Reusing the previously built package for '{source_name}'.")
+    count_metric("package_cache_hits")
+    count_metric("bytes_out", len(cached_package))
+    if output_stream is not None:
+        output_stream.write(cached_package)
+        return True
+    return cached_package
+
+# Questions mapped and deflated once, independent of the template and title image
+# (libraries: machine names of the question libraries used, None if unknown)
+MappedQuestions = namedtuple("MappedQuestions", ["segment", "count", "libraries"], defaults=(None,))
+
+# Settings-independent part of a build, kept so settings-only re-exports skip mapping
+PackageLayout = namedtuple("PackageLayout", ["source_key", "questions_segment", "question_count", "title_image", "normalize", "libraries"], defaults=(None,))
+
+# Function to validate and map the questions into a reusable deflated segment
+def map_questions_segment(json_data, source_name, normalize=normalize_text):
+    if not isinstance(json_data, dict):
+        notify("error", f"Expected a JSON object, but got {type(json_data).__name__}.")
+        return None
+
+    questions = json_data.get("questions", [])
+    if not isinstance(questions, list):
+        notify("error", f"Expected 'questions' to be a list in '{source_name}', but got {type(questions).__name__}.")
+        return None
+
+    return compress_questions(questions, source_name, normalize)
+
+# Function to map questions one at a time straight into a deflated segment
+def compress_questions(llm_questions, source_name, normalize=normalize_text):
+    counts = {"items": 0, "mapped": 0}
+
+    def count(iterable, counter):
+        for item in iterable:
+            counts[counter] += 1
+            yield item
+
+    # Map questions straight to pre-serialized H5P JSON fragments; strings are
+    # normalized on the way in, so the serialized output is valid by construction.
+    # Each fragment is deflated as soon as it is rendered, so neither the input
+    # questions nor the serialized list have to be held in memory at once.
+    libraries = set()
+    fragments = iter_questions_json(count(llm_questions, "items"), source_name, normalize, libraries)
+    segment = compress_segment(questions_json_chunks(count(fragments, "mapped")))
+    count_metric("questions_in", counts["items"])
+    count_metric("questions_mapped", counts["mapped"])
+    if not counts["items"]:
+        notify("warning", f"No questions found in '{source_name}'.")
+        return None
+    notify("info", f"Mapped {counts['mapped']} questions from '{source_name}'.")
+    if not counts["mapped"]:
+        notify("warning", f"No valid questions mapped from '{source_name}'.")
+        return None
+
+    # The questions list is deflated once and reused by every re-export
+    return MappedQuestions(segment, counts["mapped"], frozenset(libraries))
+
+# Function to map the questions of a JSON document incrementally, without parsing it as a whole
+def map_questions_stream(source, source_name, normalize=normalize_text):
+    return compress_questions(timed_iter(iter_json_array_field(source), "parse"), source_name, normalize)
+
+# Function to combine mapped questions and the title image into a reusable package layout
+def prepare_package_layout(json_data, source_name, template_zip_path, user_image_bytes=None, normalize=normalize_text, source_key=None, mapped_questions=None):
+    if mapped_questions is None:
+        mapped_questions = map_questions_segment(json_data, source_name, normalize)
+        if mapped_questions is None:
+            return None
+
+    # Downscale the title image once so content.json declares its real size
+    title_image = prepare_title_image(template_zip_path, user_image_bytes)
+
+    return PackageLayout(source_key, mapped_questions.segment, mapped_questions.count, title_image, normalize, mapped_questions.libraries)
+
+# Function to build the content.json segments for a layout and the current quiz settings
+def content_segments(layout, title, randomization, pool_size, pass_percentage):
+    head, tail = split_h5p_content(layout.normalize(title), randomization, pool_size, pass_percentage, layout.title_image)
+    return [compress_segment([head]), layout.questions_segment, compress_segment([tail], final=True)]
+
+# Function to write a package from a layout, regenerating only the settings-dependent entries
+def export_package(layout, source_name, template_zip_path, title, randomization, pool_size, pass_percentage, output_stream=None, cache_key=None, content_only=False):
+    if cache_key is not None:
+        cached_package = reuse_cached_package(cache_key, source_name, output_stream)
+        if cached_package is not None:
+            return cached_package
+
+    # Generate a title based on the source name if not provided
+    base_name = Path(title).stem if isinstance(title, str) else "H5P_Content"
+
+    # Create H5P package with the title image; with an output_stream the package
+    # is written there and True is returned instead of bytes. Cached builds are
+    # assembled in memory first so they can be stored.
+    stream_directly = output_stream is not None and cache_key is None
+    h5p_package_bytes = create_h5p_package(
+        content_segments(layout, title, randomization, pool_size, pass_percentage),
+        template_zip_path,
+        base_name,
+        output_stream=output_stream if stream_directly else None,
+        title_image=layout.title_image,
+        libraries=layout.libraries,
+        content_only=content_only
+    )
+    if not h5p_package_bytes:
+        notify("error", f"Failed to create H5P package for '{source_name}'.")
+        return None
+
+    if cache_key is not None:
+        store_cached_package(cache_key, h5p_package_bytes)
+        if output_stream is not None:
+            output_stream.write(h5p_package_bytes)
+            return True
+    return h5p_package_bytes
+
+# Function to process each JSON input (from file or text)
+def process_json_input(json_data, source_name, template_zip_path, title, randomization, pool_size, pass_percentage, user_image_bytes=None, output_stream=None, normalize=normalize_text, use_cache=True, content_only=False):
+    try:
+        # Builds are reproducible, so identical inputs can reuse a finished package
+        # (only with the default normalizer, whose rules are part of the code)
+        source_key = None
+        cache_key = None
+        if use_cache and normalize is normalize_text and isinstance(json_data, dict):
+            questions_bytes = json.dumps(json_data.get("questions", []), ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+            source_key = package_source_key(questions_bytes, template_zip_path, user_image_bytes)
+            cache_key = package_cache_key(source_key, title, randomization, pool_size, pass_percentage, content_only)
+            cached_package = reuse_cached_package(cache_key, source_name, output_stream)
+            if cached_package is not None:
+                return cached_package
+
+        layout = prepare_package_layout(json_data, source_name, template_zip_path, user_image_bytes, normalize, source_key)
+        if layout is None:
+            return None
+
+        return export_package(layout, source_name, template_zip_path, title, randomization, pool_size, pass_percentage, output_stream=output_stream, cache_key=cache_key, content_only=content_only)
+
+    except json.JSONDecodeError as e:
+        notify("error", f"JSONDecodeError while loading '{source_name}': {e}")
+        return None
+    except Exception as e:
+        notify("error", f"Unexpected error while processing '{source_name}': {e}")
+        return None
+
+# Function to process a JSON text stream (or str) with memory bounded by the package size
+def process_json_stream(source, source_name, template_zip_path, title, randomization, pool_size, pass_percentage, user_image_bytes=None, output_stream=None, normalize=normalize_text, content_only=False):
+    try:
+        mapped_questions = map_questions_stream(source, source_name, normalize)
+        if mapped_questions is None:
+            return None
+
+        layout = prepare_package_layout(None, source_name, template_zip_path, user_image_bytes, normalize, mapped_questions=mapped_questions)
+        return export_package(layout, source_name, template_zip_path, title, randomization, pool_size, pass_percentage, output_stream=output_stream, content_only=content_only)
+
+    except ValueError as e:
+        notify("error", f"Invalid JSON in '{source_name}': {e}")
+        return None
+    except Exception as e:
+        notify("error", f"Unexpected error while processing '{source_name}': {e}")
+        return None
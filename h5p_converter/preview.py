@@ -0,0 +1,45 @@
+from collections import namedtuple
+
+from .mapping import normalize_text, question_to_h5p
+
+# Validation status filters of the preview
+PREVIEW_STATUSES = ("all", "problems", "valid")
+
+# Question shown on a preview page: input position, type, H5P dict as packaged and its validation issues
+PreviewItem = namedtuple("PreviewItem", ["position", "type", "h5p", "issues"])
+
+# Function to group validation issues by the position of their question (None for the whole document)
+def issues_by_position(validation_report):
+    grouped = {}
+    for issue in validation_report or ():
+        grouped.setdefault(issue.index, []).append(issue)
+    return grouped
+
+# Function to select the bank indices matching a search query, question types and validation status
+def filter_questions(question_bank, query="", types=None, status="all", issues=None):
+    needle = query.strip().casefold()
+    issues = issues or {}
+    matches = []
+    for idx, question in enumerate(question_bank):
+        if types and question.type not in types:
+            continue
+        if status != "all" and (question.position in issues) != (status == "problems"):
+            continue
+        if needle and not any(needle in str(text).casefold() for text in question.texts()):
+            continue
+        matches.append(idx)
+    return matches
+
+# Function to count the pages needed for a number of matches
+def page_count(total, page_size):
+    return max(1, -(-total // page_size))
+
+# Function to map only the questions of one page (1-based), exactly as they will be packaged
+def preview_page(question_bank, matches, page, page_size, issues=None, normalize=normalize_text):
+    issues = issues or {}
+    start = (page - 1) * page_size
+    items = []
+    for idx in matches[start:start + page_size]:
+        question = question_bank[idx]
+        items.append(PreviewItem(question.position, question.type, question_to_h5p(question, normalize), issues.get(question.position, [])))
+    return items
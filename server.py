@@ -0,0 +1,352 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import BrokenExecutor, CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from h5p_converter import (
+    collect_diagnostics, count_metric, init_worker, process_json_input, record_build_metrics, render_build_metrics,
+    stage_span, worker_options
+)
+
+# Initialize logging
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_TEMPLATE_PATH = Path(__file__).parent / "templates" / "MC_TF.zip"
+DEFAULT_MAX_REQUEST_BYTES = 8 * 1024 * 1024
+DEFAULT_CONVERSION_TIMEOUT = 120
+
+# Function to convert one request body in a worker process; returns (package, error, build summary)
+def convert_payload(body, title, randomization, pool_size, pass_percentage, content_only):
+    with collect_diagnostics("request") as diagnostics:
+        count_metric("bytes_in", len(body))
+        try:
+            with stage_span("parse"):
+                json_data = json.loads(body)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            return None, f"Invalid JSON: {e}", diagnostics.summary()
+        h5p_package = process_json_input(
+            json_data=json_data,
+            source_name="request",
+            template_zip_path=worker_options["template_zip_path"],
+            title=title,
+            randomization=randomization,
+            pool_size=pool_size,
+            pass_percentage=pass_percentage,
+            user_image_bytes=worker_options["user_image_bytes"],
+            content_only=content_only
+        )
+    if not h5p_package:
+        return None, diagnostics.failure_reason(), diagnostics.summary()
+    return h5p_package, None, diagnostics.summary()
+
+# Function to read the quiz settings from the query string
+def parse_conversion_options(query):
+    params = urllib.parse.parse_qs(query)
+    get = lambda name, default: params.get(name, [default])[-1]
+    pool_size = int(get("pool_size", "7"))
+    if pool_size < 1:
+        raise ValueError(f"pool_size must be at least 1, got {pool_size}")
+    pass_percentage = int(get("pass_percentage", "60"))
+    if not 0 <= pass_percentage <= 100:
+        raise ValueError(f"pass_percentage must be between 0 and 100, got {pass_percentage}")
+    return {
+        "title": get("title", "Generated Quiz"),
+        "randomization": get("randomize", "true").lower() not in ("0", "false", "no"),
+        "pool_size": pool_size,
+        "pass_percentage": pass_percentage,
+        # Without the H5P libraries, for platforms that already have them installed
+        "content_only": get("content_only", "false").lower() in ("1", "true", "yes")
+    }
+
+# Conversion service: a bounded process pool behind an admission limit
+class ConversionService:
+    def __init__(self, options, workers, queue_size, max_request_bytes=DEFAULT_MAX_REQUEST_BYTES, timeout=DEFAULT_CONVERSION_TIMEOUT):
+        self.options = options
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_request_bytes = max_request_bytes
+        self.timeout = timeout
+        self.closed = False
+        self.executor_lock = threading.Lock()
+        self.executor = self.create_executor()
+        # Requests beyond the running and queued conversions are turned away
+        # instead of piling up in the executor
+        self.admission = threading.BoundedSemaphore(workers + queue_size)
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            "requests_total": 0,
+            "conversions_succeeded_total": 0,
+            "conversions_failed_total": 0,
+            "conversions_timed_out_total": 0,
+            "worker_failures_total": 0,
+            "executor_restarts_total": 0,
+            "requests_rejected_total": 0,
+            "conversions_in_flight": 0,
+            "conversion_seconds_total": 0.0
+        }
+
+    def create_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(self.options,))
+
+    # Function to replace a pool that broke (a worker died), unless another request already did
+    def restart_executor(self, broken_executor):
+        with self.executor_lock:
+            if self.executor is not broken_executor or self.closed:
+                return
+            broken_executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self.create_executor()
+        self.count("executor_restarts_total")
+        logging.warning("Conversion worker pool was broken and has been restarted.")
+
+    # Function to submit a conversion, restarting the pool once if it is found broken
+    def submit(self, body, options):
+        executor = self.executor
+        try:
+            return executor, executor.submit(convert_payload, body, **options)
+        except BrokenExecutor:
+            self.restart_executor(executor)
+            executor = self.executor
+            return executor, executor.submit(convert_payload, body, **options)
+
+    # Function to add to a counter (or gauge) under the metrics lock
+    def count(self, name, amount=1):
+        with self.metrics_lock:
+            self.metrics[name] += amount
+
+    # Function to free an admission slot once its conversion has really finished
+    def release_slot(self, started):
+        self.count("conversions_in_flight", -1)
+        self.count("conversion_seconds_total", time.perf_counter() - started)
+        self.admission.release()
+
+    # Function to take an admission slot without waiting; False (and counted) when all are taken
+    def admit(self):
+        if self.admission.acquire(blocking=False):
+            return True
+        self.count("requests_rejected_total")
+        return False
+
+    # Function to run a conversion on the pool with a slot taken by admit(), which it
+    # takes over and frees once the conversion is done; returns (package, error, status)
+    def convert(self, body, options):
+        self.count("conversions_in_flight")
+        started = time.perf_counter()
+        try:
+            executor, future = self.submit(body, options)
+        except RuntimeError as e:
+            # Shut down, or the new pool broke right away
+            self.release_slot(started)
+            self.count("worker_failures_total")
+            return None, f"Conversion service unavailable: {e}", 503
+        # A running conversion cannot be stopped, so its slot is only freed when it
+        # finishes, not when the client stops waiting; otherwise timed-out work
+        # would pile up behind the admission limit
+        future.add_done_callback(lambda _: self.release_slot(started))
+        try:
+            h5p_package, error, summary = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()  # Only stops it if it has not started yet
+            self.count("conversions_timed_out_total")
+            return None, "Conversion timed out", 504
+        except (BrokenExecutor, CancelledError):
+            # A worker died (e.g. killed for memory); later requests get a fresh pool
+            self.count("worker_failures_total")
+            self.restart_executor(executor)
+            return None, "Conversion worker failed, retry later", 503
+        except Exception as e:
+            self.count("worker_failures_total")
+            logging.exception("Conversion failed unexpectedly")
+            return None, f"Conversion failed unexpectedly: {e}", 500
+        # Builds run in the workers, so their stage timings are added up here
+        record_build_metrics(summary)
+        if error:
+            self.count("conversions_failed_total")
+            return None, error, 422
+        self.count("conversions_succeeded_total")
+        return h5p_package, None, 200
+
+    # Function to render the metrics in the Prometheus text format
+    def render_metrics(self):
+        with self.metrics_lock:
+            metrics = dict(self.metrics)
+        metrics["workers"] = self.workers
+        metrics["queue_size"] = self.queue_size
+        return "".join(f"h5p_{name} {value}\n" for name, value in metrics.items()) + render_build_metrics()
+
+    def shutdown(self):
+        with self.executor_lock:
+            self.closed = True
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+# HTTP front end: POST /convert, GET /health, GET /metrics
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    server_version = "H5PConverter/1.0"
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload, headers=None):
+        self.send_body(status, json.dumps(payload).encode('utf-8'), "application/json", headers)
+
+    def do_GET(self):
+        service = self.server.service
+        path = urllib.parse.urlsplit(self.path).path
+        if path == "/health":
+            if service.closed:
+                self.send_json(503, {"status": "unavailable", "workers": service.workers})
+            else:
+                self.send_json(200, {"status": "ok", "workers": service.workers, "executor_restarts": service.metrics["executor_restarts_total"]})
+        elif path == "/metrics":
+            self.send_body(200, service.render_metrics().encode('utf-8'), "text/plain; version=0.0.4")
+        else:
+            self.send_json(404, {"error": f"Unknown path '{path}'"})
+
+    def do_POST(self):
+        service = self.server.service
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != "/convert":
+            self.send_json(404, {"error": f"Unknown path '{url.path}'"})
+            return
+        service.count("requests_total")
+
+        content_length = self.headers.get("Content-Length")
+        if content_length is None:
+            self.send_json(411, {"error": "Content-Length is required"})
+            return
+        try:
+            content_length = int(content_length)
+        except ValueError:
+            self.send_json(400, {"error": "Invalid Content-Length"})
+            return
+        if content_length < 0:
+            self.close_connection = True
+            self.send_json(400, {"error": "Invalid Content-Length"})
+            return
+        if content_length > service.max_request_bytes:
+            # The body is not read, so the connection cannot be reused
+            self.close_connection = True
+            self.send_json(413, {"error": f"Request body exceeds {service.max_request_bytes} bytes"})
+            return
+
+        try:
+            options = parse_conversion_options(url.query)
+        except ValueError as e:
+            self.close_connection = True
+            self.send_json(400, {"error": f"Invalid option: {e}"})
+            return
+
+        # The slot is taken before the body is read, so an overloaded service
+        # does not buffer a body per waiting connection only to reject it
+        if not service.admit():
+            self.close_connection = True
+            self.send_json(503, {"error": "Too many conversions in progress, retry later"}, {"Retry-After": "1"})
+            return
+        try:
+            body = self.rfile.read(content_length)
+        except OSError:
+            service.admission.release()
+            raise
+        if len(body) < content_length:
+            service.admission.release()
+            self.close_connection = True
+            self.send_json(400, {"error": "Request body is shorter than its Content-Length"})
+            return
+
+        h5p_package, error, status = service.convert(body, options)
+        if error:
+            headers = {"Retry-After": "1"} if status == 503 else None
+            self.send_json(status, {"error": error}, headers)
+            return
+        filename = f"{Path(options['title']).stem or 'H5P_Content'}.h5p"
+        self.send_body(200, h5p_package, "application/zip", {
+            "Content-Disposition": f"attachment; filename*=UTF-8''{urllib.parse.quote(filename)}"
+        })
+
+    def log_message(self, format, *args):
+        # Route access logs through logging instead of stderr
+        logging.info("%s - %s", self.address_string(), format % args)
+
+# Function to create the HTTP server for a conversion service (port 0 picks a free port)
+def create_server(service, host="127.0.0.1", port=8000):
+    server = ThreadingHTTPServer((host, port), ConversionRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+# Function to convert question JSON through a running service (a minimal client)
+def request_conversion(base_url, json_bytes, timeout=DEFAULT_CONVERSION_TIMEOUT, **options):
+    query = urllib.parse.urlencode({name: str(value).lower() if isinstance(value, bool) else value for name, value in options.items()})
+    request = urllib.request.Request(
+        f"{base_url.rstrip('/')}/convert?{query}",
+        data=json_bytes,
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+# Function to parse the command line arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve LLM question JSON to H5P conversions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000).")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--queue-size", type=int, default=16, help="Conversions allowed to wait for a worker before requests are rejected (default: 16).")
+    parser.add_argument("--max-request-bytes", type=int, default=DEFAULT_MAX_REQUEST_BYTES, help="Largest accepted request body (default: 8 MiB).")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_CONVERSION_TIMEOUT, help="Seconds a conversion may take (default: 120).")
+    parser.add_argument("--image", default=None, help="Title image (png/jpg) to embed in every package.")
+    parser.add_argument("--template", default=str(DEFAULT_TEMPLATE_PATH), help="Path to the H5P template zip.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    template_zip_path = Path(args.template)
+    if not template_zip_path.exists():
+        print(f"Template zip file not found at '{template_zip_path}'.", file=sys.stderr)
+        return 1
+
+    user_image_bytes = None
+    if args.image:
+        try:
+            user_image_bytes = Path(args.image).read_bytes()
+        except OSError as e:
+            print(f"Error reading the image: {e}", file=sys.stderr)
+            return 1
+
+    options = {
+        "template_zip_path": template_zip_path,
+        "user_image_bytes": user_image_bytes
+    }
+    service = ConversionService(options, args.workers, args.queue_size, args.max_request_bytes, args.timeout)
+    server = create_server(service, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_port} with {args.workers} workers.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import io
+import json
+import random
+import unittest
+import zipfile
+import zlib
+from pathlib import Path
+
+from h5p_converter import (
+    compress_questions, compress_segment, content_segments, crc32_combine, create_h5p_content,
+    create_h5p_package, load_template, map_questions_to_h5p, prepare_package_layout, DEFAULT_TITLE_IMAGE
+)
+from h5p_converter.archive import write_raw_zip_entry, write_segmented_zip_entry
+
+TEMPLATE_PATH = Path(__file__).parent.parent / "templates" / "MC_TF.zip"
+
+QUESTIONS = [
+    {"type": "MultipleChoice", "question": "Was ist die Größe der Straße?", "options": [
+        {"text": "„Groß“", "is_correct": True, "feedback": "Richtig\nso"},
+        {"text": "Klein", "is_correct": False}
+    ]},
+    {"type": "TrueFalse", "question": "Wasser ist nass ✓", "correct_answer": True,
+     "feedback_correct": "Ja", "feedback_incorrect": "Nein"},
+    {"type": "MultipleChoice", "question": "Leer?", "options": []},
+]
+
+SETTINGS = {"title": "Test Quiz", "randomization": True, "pool_size": 2, "pass_percentage": 60}
+
+class Crc32CombineTest(unittest.TestCase):
+    def assertCombines(self, first, second):
+        combined = crc32_combine(zlib.crc32(first), zlib.crc32(second), len(second))
+        self.assertEqual(combined, zlib.crc32(first + second))
+
+    def test_matches_crc_of_concatenation(self):
+        rng = random.Random(0)
+        for first_size, second_size in ((0, 0), (0, 1), (1, 0), (1, 1), (3, 7), (100, 1000), (4096, 65537)):
+            with self.subTest(first=first_size, second=second_size):
+                self.assertCombines(rng.randbytes(first_size), rng.randbytes(second_size))
+
+    def test_large_lengths(self):
+        rng = random.Random(1)
+        first = rng.randbytes(1000)
+        self.assertCombines(first, bytes(5 * 1024 * 1024))
+        self.assertCombines(first, rng.randbytes(3 * 1024 * 1024 + 1))
+
+    def test_zero_length_keeps_first_crc(self):
+        self.assertEqual(crc32_combine(0x12345678, 0, 0), 0x12345678)
+
+    def test_folds_many_segments(self):
+        rng = random.Random(2)
+        pieces = [rng.randbytes(rng.randrange(0, 300)) for _ in range(50)]
+        crc = 0
+        for piece in pieces:
+            crc = crc32_combine(crc, zlib.crc32(piece), len(piece))
+        self.assertEqual(crc, zlib.crc32(b"".join(pieces)))
+
+class SegmentedEntryTest(unittest.TestCase):
+    def test_segments_form_one_valid_entry(self):
+        texts = ["erster Teil ", "", "zweiter Teil mit Umlauten äöü " * 1000, "letzter"]
+        segments = [compress_segment([text]) for text in texts[:-1]] + [compress_segment([texts[-1]], final=True)]
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as target_zip:
+            write_segmented_zip_entry(target_zip, "content/content.json", segments)
+        with zipfile.ZipFile(buffer) as written:
+            self.assertIsNone(written.testzip())
+            self.assertEqual(written.read("content/content.json").decode('utf-8'), "".join(texts))
+
+    def test_spliced_content_json_matches_full_serialization(self):
+        mapped_questions = compress_questions(QUESTIONS, "test")
+        layout = prepare_package_layout(None, "test", TEMPLATE_PATH, mapped_questions=mapped_questions)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as target_zip:
+            write_segmented_zip_entry(target_zip, "content/content.json", content_segments(layout, **SETTINGS))
+
+        expected = json.dumps(
+            create_h5p_content(map_questions_to_h5p(QUESTIONS, "test"), title_image=DEFAULT_TITLE_IMAGE, **SETTINGS),
+            ensure_ascii=False, indent=4
+        )
+        with zipfile.ZipFile(buffer) as written:
+            self.assertIsNone(written.testzip())
+            self.assertEqual(written.read("content/content.json").decode('utf-8'), expected)
+
+# Write-only sink without tell() or seek(), like a socket or pipe
+class NonSeekableSink(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def getvalue(self):
+        return b"".join(self.chunks)
+
+class RawEntryTest(unittest.TestCase):
+    def test_raw_copies_match_the_template(self):
+        template = load_template(TEMPLATE_PATH)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as target_zip:
+            for item, raw_bytes in template.entries:
+                write_raw_zip_entry(target_zip, item, raw_bytes)
+            target_zip.writestr("after.txt", b"written normally after the raw copies")
+
+        with zipfile.ZipFile(TEMPLATE_PATH) as source, zipfile.ZipFile(buffer) as written:
+            self.assertIsNone(written.testzip())
+            self.assertEqual(written.namelist(), [item.filename for item, _ in template.entries] + ["after.txt"])
+            for item, _ in template.entries:
+                self.assertEqual(written.read(item.filename), source.read(item.filename))
+            self.assertEqual(written.read("after.txt"), b"written normally after the raw copies")
+
+    def test_package_entries_are_valid(self):
+        mapped_questions = compress_questions(QUESTIONS, "test")
+        layout = prepare_package_layout(None, "test", TEMPLATE_PATH, mapped_questions=mapped_questions)
+        package = create_h5p_package(content_segments(layout, **SETTINGS), TEMPLATE_PATH, "Test Quiz", title_image=layout.title_image)
+        with zipfile.ZipFile(io.BytesIO(package)) as written:
+            self.assertIsNone(written.testzip())
+            self.assertEqual(json.loads(written.read("h5p.json"))["title"], "Test Quiz")
+
+    def test_non_seekable_sink(self):
+        mapped_questions = compress_questions(QUESTIONS, "test")
+        layout = prepare_package_layout(None, "test", TEMPLATE_PATH, mapped_questions=mapped_questions)
+        segments = content_segments(layout, **SETTINGS)
+        in_memory = create_h5p_package(segments, TEMPLATE_PATH, "Test Quiz", title_image=layout.title_image)
+
+        sink = NonSeekableSink()
+        self.assertIs(create_h5p_package(segments, TEMPLATE_PATH, "Test Quiz", output_stream=sink, title_image=layout.title_image), True)
+        with zipfile.ZipFile(io.BytesIO(sink.getvalue())) as streamed, zipfile.ZipFile(io.BytesIO(in_memory)) as expected:
+            self.assertIsNone(streamed.testzip())
+            self.assertEqual(streamed.namelist(), expected.namelist())
+            for name in expected.namelist():
+                self.assertEqual(streamed.read(name), expected.read(name))
+
+if __name__ == "__main__":
+    unittest.main()
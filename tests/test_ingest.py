@@ -0,0 +1,72 @@
+import io
+import json
+import unittest
+
+from h5p_converter import iter_json_array_field, validate_json_text
+
+DOCUMENT = {
+    "title": "Quiz",
+    "meta": {"numbers": [12345, -0.5, 1e10, 2.5E-3], "flags": [True, False, None]},
+    "questions": [
+        {"type": "TrueFalse", "question": "Ist \"Straße\" üblich? \\ ✓", "correct_answer": True},
+        12345678901234567890,
+        -1.25e+17,
+        "text with , ] } inside",
+        [True, False, None],
+        {"type": "MultipleChoice", "options": [{"text": "a", "is_correct": False}]},
+    ],
+    "after": {"questions": ["not the top-level field"]}
+}
+
+class IterJsonArrayFieldTest(unittest.TestCase):
+    def parse(self, text, chunk_size):
+        return list(iter_json_array_field(text, chunk_size=chunk_size))
+
+    def test_matches_json_loads_for_every_chunk_size(self):
+        for indent in (None, 2):
+            text = json.dumps(DOCUMENT, ensure_ascii=False, indent=indent)
+            for chunk_size in (1, 2, 3, 7, 64 * 1024):
+                with self.subTest(indent=indent, chunk_size=chunk_size):
+                    self.assertEqual(self.parse(text, chunk_size), DOCUMENT["questions"])
+
+    def test_values_split_across_chunks(self):
+        # With one character per chunk every number, string and literal is cut apart
+        for value in (1, 10, 1e10, -12.5e-3, "ab\"c\\u00e9", True, False, None):
+            text = '{"questions": [%s, %s]}' % (json.dumps(value), json.dumps(value))
+            with self.subTest(value=value):
+                self.assertEqual(self.parse(text, 1), [value, value])
+
+    def test_reads_text_streams(self):
+        text = json.dumps(DOCUMENT, ensure_ascii=False)
+        self.assertEqual(list(iter_json_array_field(io.StringIO(text), chunk_size=5)), DOCUMENT["questions"])
+
+    def test_missing_or_empty_field(self):
+        for text in ('{}', ' { } ', '{"questions": []}', '{"other": [1, 2]}'):
+            with self.subTest(text=text):
+                self.assertEqual(self.parse(text, 1), [])
+
+    def test_error_positions(self):
+        cases = (
+            ('[1, 2]', "Expected a JSON object at character 0"),
+            ('{"questions": 5}', "Expected 'questions' to be a list at character 14"),
+            ('{"questions": [1 2]}', "Expected ',' or ']' at character 17"),
+            ('{"questions": [1, tru]}', "at character 18"),
+            ('{"questions": [1]', "Expected ',' or '}' at character 17, found end of input"),
+            ('{"questions": [1]} {"x": 1}', "Unexpected data at character 19"),
+            ('{"questions": []} garbage', "Unexpected data at character 18"),
+            ('{"questions": [1], "questions": [2]}', "Duplicate 'questions' field at character 19"),
+        )
+        for text, message in cases:
+            for chunk_size in (1, 64 * 1024):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    with self.assertRaises(ValueError) as raised:
+                        self.parse(text, chunk_size)
+                    self.assertIn(message, str(raised.exception))
+
+    def test_trailing_data_is_a_validation_issue(self):
+        issues = validate_json_text('{"questions": []} garbage')
+        self.assertEqual(len(issues), 1)
+        self.assertIn("Unexpected data", issues[0].reason)
+
+if __name__ == "__main__":
+    unittest.main()
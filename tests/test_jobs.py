@@ -0,0 +1,93 @@
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from h5p_converter import normalize_text, process_json_input, start_build
+from h5p_converter.jobs import MAX_BUILD_WORKERS
+
+TEMPLATE_PATH = Path(__file__).parent.parent / "templates" / "MC_TF.zip"
+
+# Large enough that a build takes a noticeable time
+QUESTION_COUNT = 5000
+BANK = {"questions": [
+    {"type": "TrueFalse", "question": f"Aussage {number}", "correct_answer": number % 2 == 0}
+    for number in range(QUESTION_COUNT)
+]}
+
+# Normalizer that holds the build at its first string until released
+class GatedNormalizer:
+    def __init__(self):
+        self.reached = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, text):
+        self.reached.set()
+        self.release.wait(10)
+        return normalize_text(text)
+
+# Function to start a build of BANK in the background
+def start_bank_build(name, normalize=normalize_text):
+    return start_build(name, name, process_json_input, BANK, name, TEMPLATE_PATH, "Quiz", True, 7, 60,
+                       normalize=normalize, use_cache=False, questions_total=QUESTION_COUNT)
+
+# Function to wait until a job has finished
+def wait_for(job, timeout=60):
+    job.future.exception(timeout)
+
+class BuildJobTest(unittest.TestCase):
+    def test_progress_moves_forward(self):
+        job = start_bank_build("progress")
+        snapshots = []
+        while not job.done():
+            snapshots.append(job.progress())
+            time.sleep(0.01)
+        wait_for(job)
+        snapshots.append(job.progress())
+
+        done = [snapshot.questions_done for snapshot in snapshots]
+        self.assertEqual(done, sorted(done))
+        # Snapshots were taken while the questions were being mapped
+        self.assertTrue(any(0 < questions_done < QUESTION_COUNT for questions_done in done))
+        self.assertEqual(done[-1], QUESTION_COUNT)
+        self.assertEqual(snapshots[-1].questions_total, QUESTION_COUNT)
+        seconds = [snapshot.seconds for snapshot in snapshots]
+        self.assertEqual(seconds, sorted(seconds))
+        self.assertTrue(job.result())
+
+    def test_cancel_stops_a_running_build(self):
+        normalize = GatedNormalizer()
+        job = start_bank_build("cancel", normalize)
+        self.assertTrue(normalize.reached.wait(10))
+        job.cancel()
+        normalize.release.set()
+        wait_for(job)
+
+        self.assertTrue(job.cancelled)
+        self.assertIsNone(job.result())
+        self.assertLess(job.progress().questions_done, QUESTION_COUNT)
+        warnings = [text for level, text in job.diagnostics.messages if level == "warning"]
+        self.assertEqual(warnings, ["Build of 'cancel' was cancelled."])
+
+    def test_cancel_before_start_never_runs(self):
+        # Occupy every worker, so the next job has to wait in the queue
+        blockers = [(GatedNormalizer(), f"blocker {number}") for number in range(MAX_BUILD_WORKERS)]
+        blocking_jobs = [start_bank_build(name, normalize) for normalize, name in blockers]
+        try:
+            for normalize, _ in blockers:
+                self.assertTrue(normalize.reached.wait(10))
+            job = start_bank_build("queued")
+            job.cancel()
+        finally:
+            for normalize, _ in blockers:
+                normalize.release.set()
+        for blocking_job in blocking_jobs:
+            wait_for(blocking_job)
+
+        self.assertTrue(job.done())
+        self.assertIsNone(job.started)
+        self.assertIsNone(job.result())
+        self.assertEqual(job.diagnostics.messages, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from h5p_converter import (
+    create_text_normalizer, normalize_text, DEFAULT_NORMALIZATION_RULES, TYPOGRAPHIC_QUOTE_RULES
+)
+
+SAMPLES = ["", "plain ascii", "Straße „Größe“ ‘x’ ß", "ßßß", "no rule here: äöü", "‚a‘ “b” ”c„"]
+
+# Function to apply rules the reference way: single characters in one translate pass, then the rest
+def reference_normalize(rules, value):
+    value = value.translate(str.maketrans({old: new for old, new in rules if len(old) == 1}))
+    for old, new in rules:
+        if len(old) != 1:
+            value = value.replace(old, new)
+    return value
+
+class TextNormalizerTest(unittest.TestCase):
+    def assertMatchesReference(self, rules):
+        normalize = create_text_normalizer(rules)
+        for sample in SAMPLES:
+            with self.subTest(rules=rules, sample=sample):
+                self.assertEqual(normalize(sample), reference_normalize(rules, sample))
+
+    def test_small_tables(self):
+        self.assertMatchesReference(DEFAULT_NORMALIZATION_RULES)
+        self.assertMatchesReference(DEFAULT_NORMALIZATION_RULES + TYPOGRAPHIC_QUOTE_RULES)
+        self.assertMatchesReference((("Straße", "Strasse"), ("ß", "ss")))
+
+    def test_rules_feeding_each_other_are_applied_once(self):
+        # "ß" becomes "ss", which must not be turned into "zz" afterwards
+        self.assertMatchesReference((("ß", "ss"), ("s", "z")))
+        self.assertEqual(create_text_normalizer((("ß", "ss"), ("s", "z")))("ßs"), "ssz")
+
+    def test_large_tables(self):
+        self.assertMatchesReference(tuple((chr(code), chr(code).upper()) for code in range(ord("a"), ord("z") + 1)))
+
+    def test_non_strings_pass_through(self):
+        for value in (None, 5, True, ["ß"]):
+            self.assertIs(normalize_text(value), value)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import io
+import json
+import tempfile
+import unittest
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+from unittest import mock
+
+from h5p_converter import (
+    collect_diagnostics, load_template, map_multiple_choice, map_true_false, process_json_input, resolve_libraries
+)
+from h5p_converter import packaging
+
+TEMPLATE_PATH = Path(__file__).parent.parent / "templates" / "MC_TF.zip"
+
+MULTIPLE_CHOICE = {"type": "MultipleChoice", "question": "Was ist 2 + 2?", "options": [
+    {"text": "4", "is_correct": True}, {"text": "5", "is_correct": False}
+]}
+TRUE_FALSE = {"type": "TrueFalse", "question": "Die Erde ist rund.", "correct_answer": True}
+
+SETTINGS = {"title": "Test Quiz", "randomization": True, "pool_size": 2, "pass_percentage": 60}
+
+# Function to build a package and return it with its diagnostics
+def build(questions, template_zip_path=TEMPLATE_PATH, **kwargs):
+    with collect_diagnostics("test", record=False) as diagnostics:
+        package = process_json_input({"questions": questions}, "test", template_zip_path, use_cache=False, **SETTINGS, **kwargs)
+    return package, diagnostics
+
+# Function to list the top-level folders of a package
+def top_level_folders(package):
+    with zipfile.ZipFile(io.BytesIO(package)) as written:
+        return {name.partition("/")[0] for name in written.namelist() if "/" in name}
+
+class ResolveLibrariesTest(unittest.TestCase):
+    def test_multiple_choice_only_bank(self):
+        package, _ = build([MULTIPLE_CHOICE])
+        folders = top_level_folders(package)
+        self.assertIn("H5P.MultiChoice-1.16", folders)
+        self.assertNotIn("H5P.TrueFalse-1.8", folders)
+        # Editor library needed only by TrueFalse
+        self.assertNotIn("H5PEditor.RadioGroup-1.1", folders)
+
+    def test_mixed_bank_ships_both_question_libraries(self):
+        package, _ = build([MULTIPLE_CHOICE, TRUE_FALSE])
+        folders = top_level_folders(package)
+        self.assertTrue({"H5P.MultiChoice-1.16", "H5P.TrueFalse-1.8", "H5PEditor.RadioGroup-1.1"} <= folders)
+
+    def test_preloaded_dependencies_come_first(self):
+        package, _ = build([MULTIPLE_CHOICE, TRUE_FALSE])
+        with zipfile.ZipFile(io.BytesIO(package)) as written:
+            dependencies = [library["machineName"] for library in json.loads(written.read("h5p.json"))["preloadedDependencies"]]
+        template = load_template(TEMPLATE_PATH)
+        self.assertEqual(len(dependencies), len(set(dependencies)))
+        for position, machine_name in enumerate(dependencies):
+            for dependency in template.libraries[machine_name].preloaded:
+                with self.subTest(library=machine_name, dependency=dependency):
+                    self.assertIn(dependency, dependencies[:position])
+        self.assertNotIn("H5PEditor.RadioGroup", dependencies)
+
+    def test_missing_library_is_reported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Template without the TrueFalse library (the template repeats some
+            # entries, so each name is copied once)
+            template_zip_path = Path(directory) / "template.zip"
+            with zipfile.ZipFile(TEMPLATE_PATH) as source, zipfile.ZipFile(template_zip_path, 'w') as target:
+                for name in dict.fromkeys(source.namelist()):
+                    if not name.startswith("H5P.TrueFalse-1.8/"):
+                        target.writestr(name, source.read(name))
+
+            with collect_diagnostics("test", record=False) as diagnostics:
+                folders, runtime = resolve_libraries(load_template(template_zip_path), ["H5P.TrueFalse"])
+            self.assertNotIn("H5P.TrueFalse-1.8", folders)
+            self.assertNotIn("H5P.TrueFalse", [library.machine_name for library in runtime])
+            warnings = [text for level, text in diagnostics.messages if level == "warning"]
+            self.assertEqual(warnings, ["The template does not contain the libraries H5P.TrueFalse."])
+
+class ContentOnlyTest(unittest.TestCase):
+    def test_only_content_and_h5p_json(self):
+        package, _ = build([MULTIPLE_CHOICE, TRUE_FALSE], content_only=True)
+        with zipfile.ZipFile(io.BytesIO(package)) as written:
+            self.assertIsNone(written.testzip())
+            names = written.namelist()
+            self.assertIn("h5p.json", names)
+            self.assertIn("content/content.json", names)
+            self.assertEqual([name for name in names if name != "h5p.json" and not name.startswith("content/")], [])
+            # The platform still needs to know which libraries to load
+            self.assertTrue(json.loads(written.read("h5p.json"))["preloadedDependencies"])
+
+    def test_content_matches_the_full_package(self):
+        full, _ = build([MULTIPLE_CHOICE, TRUE_FALSE])
+        content_only, _ = build([MULTIPLE_CHOICE, TRUE_FALSE], content_only=True)
+        with zipfile.ZipFile(io.BytesIO(full)) as expected, zipfile.ZipFile(io.BytesIO(content_only)) as written:
+            for name in written.namelist():
+                with self.subTest(name=name):
+                    self.assertEqual(written.read(name), expected.read(name))
+
+class ReproducibleBuildTest(unittest.TestCase):
+    def test_uncached_builds_are_identical(self):
+        first, _ = build([MULTIPLE_CHOICE, TRUE_FALSE, MULTIPLE_CHOICE])
+        second, _ = build([MULTIPLE_CHOICE, TRUE_FALSE, MULTIPLE_CHOICE])
+        self.assertEqual(first, second)
+
+    def test_mappers_default_to_stable_ids(self):
+        self.assertEqual(map_multiple_choice(MULTIPLE_CHOICE)["subContentId"], map_multiple_choice(MULTIPLE_CHOICE)["subContentId"])
+        self.assertEqual(map_true_false(TRUE_FALSE)["subContentId"], map_true_false(TRUE_FALSE)["subContentId"])
+
+class PackageCacheTest(unittest.TestCase):
+    def setUp(self):
+        # Each test starts from an empty cache with a budget of 100 bytes
+        for name, value in (("_package_cache", OrderedDict()), ("_package_cache_bytes", 0), ("PACKAGE_CACHE_MAX_BYTES", 100)):
+            patcher = mock.patch.object(packaging, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_evicts_least_recently_used(self):
+        for key in ("a", "b", "c", "d"):
+            packaging.store_cached_package(key, key.encode() * 25)
+        # Using "a" makes "b" the least recently used
+        self.assertEqual(packaging.get_cached_package("a"), b"a" * 25)
+        packaging.store_cached_package("e", b"e" * 25)
+        self.assertIsNone(packaging.get_cached_package("b"))
+        for key in ("a", "c", "d", "e"):
+            self.assertEqual(packaging.get_cached_package(key), key.encode() * 25)
+        self.assertEqual(packaging._package_cache_bytes, 100)
+
+    def test_skips_packages_over_a_quarter_of_the_budget(self):
+        packaging.store_cached_package("small", b"s" * 25)
+        packaging.store_cached_package("large", b"l" * 26)
+        self.assertIsNone(packaging.get_cached_package("large"))
+        self.assertEqual(packaging.get_cached_package("small"), b"s" * 25)
+        self.assertEqual(packaging._package_cache_bytes, 25)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import http.client
+import io
+import json
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+import zipfile
+
+from server import create_server, request_conversion, ConversionService, DEFAULT_TEMPLATE_PATH
+
+QUESTIONS = {"questions": [
+    {"type": "MultipleChoice", "question": "Was ist 2 + 2?", "options": [
+        {"text": "4", "is_correct": True}, {"text": "5", "is_correct": False}
+    ]},
+    {"type": "TrueFalse", "question": "Die Erde ist rund.", "correct_answer": True},
+]}
+
+SERVICE_OPTIONS = {"template_zip_path": DEFAULT_TEMPLATE_PATH, "user_image_bytes": None}
+
+# Function to start a conversion service on a free local port; returns (service, server, base URL)
+def start_service(**kwargs):
+    service = ConversionService(SERVICE_OPTIONS, workers=1, queue_size=0, **kwargs)
+    server = create_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return service, server, f"http://127.0.0.1:{server.server_port}"
+
+# Function to stop a service started by start_service
+def stop_service(service, server):
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+class ConversionServiceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service, cls.server, cls.base_url = start_service(max_request_bytes=16 * 1024)
+
+    @classmethod
+    def tearDownClass(cls):
+        stop_service(cls.service, cls.server)
+
+    def get(self, path):
+        try:
+            with urllib.request.urlopen(self.base_url + path, timeout=10) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def test_converts_to_a_valid_package(self):
+        status, body = request_conversion(self.base_url, json.dumps(QUESTIONS).encode('utf-8'), title="Service Quiz", pool_size=2)
+        self.assertEqual(status, 200)
+        with zipfile.ZipFile(io.BytesIO(body)) as package:
+            self.assertIsNone(package.testzip())
+            self.assertEqual(json.loads(package.read("h5p.json"))["title"], "Service Quiz")
+            content = json.loads(package.read("content/content.json"))
+            self.assertEqual(len(content["questions"]), 2)
+            self.assertEqual(content["poolSize"], 2)
+
+    def test_rejects_oversized_bodies(self):
+        status, body = request_conversion(self.base_url, b" " * (32 * 1024))
+        self.assertEqual(status, 413)
+        self.assertIn("exceeds", json.loads(body)["error"])
+
+    # Function to send a POST with a chosen Content-Length and body; returns (status, body)
+    def post_raw(self, content_length, body=b""):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=10)
+        try:
+            connection.putrequest("POST", "/convert")
+            connection.putheader("Content-Length", str(content_length))
+            connection.endheaders()
+            connection.send(body)
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def test_rejects_negative_content_length(self):
+        status, body = self.post_raw(-1, b'{"questions": []}' + b" " * 4096)
+        self.assertEqual(status, 400)
+        self.assertIn("Content-Length", json.loads(body)["error"])
+
+    def test_rejects_before_reading_the_body(self):
+        self.assertTrue(self.service.admission.acquire(blocking=False))
+        try:
+            # The body is never sent; the answer must not wait for it
+            status, _ = self.post_raw(1024)
+        finally:
+            self.service.admission.release()
+        self.assertEqual(status, 503)
+
+    def test_rejects_out_of_range_options(self):
+        body = json.dumps(QUESTIONS).encode('utf-8')
+        for options in ({"pool_size": 0}, {"pool_size": -3}, {"pass_percentage": 500}, {"pass_percentage": -1}):
+            with self.subTest(**options):
+                status, response = request_conversion(self.base_url, body, **options)
+                self.assertEqual(status, 400)
+                self.assertIn("Invalid option", json.loads(response)["error"])
+
+    def test_rejects_invalid_json(self):
+        status, body = request_conversion(self.base_url, b'{"questions": [')
+        self.assertEqual(status, 422)
+        self.assertIn("Invalid JSON", json.loads(body)["error"])
+
+    def test_reports_why_nothing_was_converted(self):
+        status, body = request_conversion(self.base_url, b'{}')
+        self.assertEqual(status, 422)
+        self.assertIn("No questions found", json.loads(body)["error"])
+
+    def test_rejects_requests_beyond_the_admission_limit(self):
+        # Occupy the only slot, as a running conversion would
+        self.assertTrue(self.service.admission.acquire(blocking=False))
+        try:
+            status, body = request_conversion(self.base_url, json.dumps(QUESTIONS).encode('utf-8'))
+        finally:
+            self.service.admission.release()
+        self.assertEqual(status, 503)
+        self.assertIn("retry", json.loads(body)["error"])
+
+    def test_health_and_metrics(self):
+        status, body = self.get("/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["status"], "ok")
+
+        request_conversion(self.base_url, json.dumps(QUESTIONS).encode('utf-8'))
+        status, body = self.get("/metrics")
+        self.assertEqual(status, 200)
+        metrics = dict(line.rsplit(" ", 1) for line in body.decode('utf-8').splitlines())
+        self.assertGreaterEqual(int(metrics["h5p_requests_total"]), 1)
+        self.assertGreaterEqual(int(metrics["h5p_conversions_succeeded_total"]), 1)
+        self.assertIn("h5p_builds_total", metrics)
+
+        self.assertEqual(self.get("/unknown")[0], 404)
+
+class ConversionTimeoutTest(unittest.TestCase):
+    def test_timed_out_conversion_keeps_its_slot(self):
+        service, server, base_url = start_service(timeout=0.01)
+        try:
+            bank = {"questions": QUESTIONS["questions"] * 1000}
+            status, _ = request_conversion(base_url, json.dumps(bank).encode('utf-8'))
+            self.assertEqual(status, 504)
+            # The worker is still busy, so no other conversion may be admitted
+            status, _ = request_conversion(base_url, json.dumps(QUESTIONS).encode('utf-8'))
+            self.assertEqual(status, 503)
+
+            # The slot comes back once the worker has finished
+            deadline = time.monotonic() + 60
+            while not service.admission.acquire(timeout=0.05):
+                self.assertLess(time.monotonic(), deadline)
+            service.admission.release()
+            service.timeout = 60
+            status, _ = request_conversion(base_url, json.dumps(QUESTIONS).encode('utf-8'))
+            self.assertEqual(status, 200)
+        finally:
+            stop_service(service, server)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import unittest
+
+from h5p_converter import validate_json_text, validate_questions, ValidationIssue
+
+MULTIPLE_CHOICE = {"type": "MultipleChoice", "question": "Was ist 2 + 2?", "options": [
+    {"text": "4", "is_correct": True}, {"text": "5", "is_correct": False}
+]}
+TRUE_FALSE = {"type": "TrueFalse", "question": "Die Erde ist rund.", "correct_answer": True}
+
+class ValidateQuestionsTest(unittest.TestCase):
+    def test_valid_bank_has_no_issues(self):
+        self.assertEqual(validate_questions([MULTIPLE_CHOICE, TRUE_FALSE]), [])
+
+    def test_booleans_need_the_exact_type(self):
+        for value in (1, 0, "true"):
+            with self.subTest(value=value):
+                question = dict(TRUE_FALSE, correct_answer=value)
+                self.assertEqual(validate_questions([question]), [ValidationIssue(1, "correct_answer", "must be true or false")])
+
+        options = [{"text": "4", "is_correct": 1}, {"text": "5", "is_correct": "true"}]
+        issues = validate_questions([dict(MULTIPLE_CHOICE, options=options)])
+        self.assertIn(ValidationIssue(1, "options[0].is_correct", "must be true or false"), issues)
+        self.assertIn(ValidationIssue(1, "options[1].is_correct", "must be true or false"), issues)
+        # Neither 1 nor "true" counts as a correct option
+        self.assertIn(ValidationIssue(1, "options", "has no correct option"), issues)
+
+    def test_null_counts_as_missing(self):
+        issues = validate_questions([dict(TRUE_FALSE, question=None, correct_answer=None, feedback_correct=None)])
+        self.assertEqual(issues, [
+            ValidationIssue(1, "question", "is missing"),
+            ValidationIssue(1, "correct_answer", "is missing"),
+        ])
+
+    def test_blank_strings_are_empty(self):
+        self.assertEqual(validate_questions([dict(TRUE_FALSE, question=" \n")]), [ValidationIssue(1, "question", "is empty")])
+
+    def test_options(self):
+        cases = (
+            ([], [ValidationIssue(1, "options", "has no options")]),
+            ([{"text": "4", "is_correct": False}], [ValidationIssue(1, "options", "has no correct option")]),
+            (["4", {"text": "5", "is_correct": True}], [ValidationIssue(1, "options[0]", "must be a JSON object")]),
+            ([{"is_correct": True}], [ValidationIssue(1, "options[0].text", "is missing")]),
+            ("4", [ValidationIssue(1, "options", "must be a list")]),
+        )
+        for options, expected in cases:
+            with self.subTest(options=options):
+                self.assertEqual(validate_questions([dict(MULTIPLE_CHOICE, options=options)]), expected)
+
+    def test_type_names_are_stripped(self):
+        questions = [dict(MULTIPLE_CHOICE, type=" MultipleChoice\n"), dict(TRUE_FALSE, type="TrueFalse ")]
+        self.assertEqual(validate_questions(questions), [])
+
+    def test_unknown_or_missing_type(self):
+        without_type = {key: value for key, value in TRUE_FALSE.items() if key != "type"}
+        issues = validate_questions([dict(TRUE_FALSE, type="Essay"), without_type, ["not", "an", "object"]])
+        self.assertEqual([(issue.index, issue.field) for issue in issues], [(1, "type"), (2, "type"), (3, None)])
+        self.assertIn("'Essay' is not one of MultipleChoice, TrueFalse", issues[0].reason)
+        self.assertEqual(issues[1].reason, "is missing")
+        self.assertEqual(issues[2].reason, "has type list, not a JSON object")
+
+    def test_indexes_are_one_based(self):
+        issues = validate_questions([MULTIPLE_CHOICE, dict(TRUE_FALSE, correct_answer=None)])
+        self.assertEqual(issues, [ValidationIssue(2, "correct_answer", "is missing")])
+
+class ValidateJsonTextTest(unittest.TestCase):
+    def test_valid_document(self):
+        self.assertEqual(validate_json_text(json.dumps({"questions": [MULTIPLE_CHOICE, TRUE_FALSE]})), [])
+
+    def test_document_without_questions(self):
+        for text in ('{}', '{"questions": []}'):
+            with self.subTest(text=text):
+                self.assertEqual(validate_json_text(text), [ValidationIssue(None, "questions", "has no questions")])
+
+    def test_syntax_errors_are_document_issues(self):
+        for text in ('', '[1, 2]', '{"questions": [', '{"questions": 5}'):
+            with self.subTest(text=text):
+                issues = validate_json_text(text)
+                self.assertEqual(len(issues), 1)
+                self.assertIsNone(issues[0].index)
+                self.assertIn("at character", issues[0].reason)
+
+    def test_issues_before_a_syntax_error_are_kept(self):
+        text = '{"questions": [%s, %s' % (json.dumps(dict(TRUE_FALSE, correct_answer=1)), json.dumps(TRUE_FALSE))
+        issues = validate_json_text(text)
+        self.assertEqual(issues[0], ValidationIssue(1, "correct_answer", "must be true or false"))
+        self.assertEqual(len(issues), 2)
+        self.assertIsNone(issues[1].index)
+
+if __name__ == "__main__":
+    unittest.main()